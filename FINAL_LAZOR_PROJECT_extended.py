@@ -1,6 +1,44 @@
-import copy 
+import argparse
+import array
+import glob
+import hashlib
+import itertools
+import collections
+import json
+import logging
+import os
+import math
+import mmap
+import multiprocessing
 import random 
-from PIL import Image
+import sqlite3
+import struct
+import sys
+import time
+
+
+# PIL and numpy are only needed to save the solution images, so they are imported the first time an image is saved (see image_backend())
+_IMAGE_BACKEND = None
+
+
+def image_backend():
+    '''
+    Imports the libraries used to render the solution images (PIL and numpy) the first time it is called, so that processes that only solve boards never load them.
+
+    **Returns**
+        backend: *tuple*
+            the PIL.Image and numpy modules, or None if PIL or numpy are not installed
+    '''
+    global _IMAGE_BACKEND
+    if _IMAGE_BACKEND is None:
+        try:
+            import numpy
+            from PIL import Image
+        except ImportError:
+            _IMAGE_BACKEND = False
+        else:
+            _IMAGE_BACKEND = (Image, numpy)
+    return _IMAGE_BACKEND or None
 
 
 def set_color(img, x0, y0, dim, color):
@@ -48,33 +86,143 @@ def save_board(board, blockSize=2, basename="lazor_solution_"):
             String used as the first part of the image
             name
     **Returns**
-        None
+        None. No image is saved if PIL or numpy are
+        not installed
     '''
+    backend = image_backend()
+    if backend is None:
+        LOG_RENDER.warning('PIL and numpy are needed to save the solution image, the image is not saved')
+        return
+    Image, np = backend
     # Width of the image
     w_blocks = len(board[0])
     # Height of the image
     h_blocks = len(board)
-    # Tuple containing the width and length of the image
-    # uses the block size to increase the dimensions of the image
-    SIZE = (w_blocks * blockSize, h_blocks * blockSize)
-    # Creating the image file
-    # Note that the image is all black
-    img = Image.new("RGB", SIZE, color=COLORS[VALID])
-    # Nested for loop to go through the the newly
-    # created image file and set different color
-    # i.e. the PATH
-    for y, row in enumerate(board):
-        for x, block_ID in enumerate(row):
-            set_color(img, x, y, blockSize, COLORS[block_ID])
+    # Color of every block type, indexed by the block ID
+    palette = np.zeros((max(COLORS) + 1, 3), dtype=np.uint8)
+    for block_ID, color in COLORS.items():
+        palette[block_ID] = color
+    # One pixel per block, then every pixel is repeated
+    # blockSize times along both axes
+    pixels = palette[np.asarray(board)]
+    pixels = pixels.repeat(blockSize, axis=0).repeat(blockSize, axis=1)
+    # Creating the image file from the whole array at once
+    img = Image.fromarray(pixels, "RGB")
     # Saving the image
     img.save("%s_%d_%d_%d.png"
              % (basename, w_blocks, h_blocks, blockSize))
 
 
 
+class Puzzle(collections.namedtuple("Puzzle", ["board", "n_reflect", "n_opaque", "n_refract", "lasers", "targets"])):
+    '''
+    Puzzle read from a .bff file (see read_puzzle()). It is immutable and already validated, so it can be shared between games.
+
+    - board: tuple of str, one string per row of the board with one character per cell ('o', 'x', 'A', 'B' or 'C')
+    - n_reflect, n_opaque, n_refract: number of REFLECT, OPAQUE and REFRACT blocks available
+    - lasers: tuple of (x, y, xdir, ydir) tuples, grid position and direction of every laser
+    - targets: tuple of (x, y) grid positions of the target points
+    '''
+    __slots__ = ()
+
+    def as_args(self):
+        '''
+        Returns the puzzle in the form returned by read_file() (new lists, that can be changed freely).
+        '''
+        return (list(self.board), [self.n_reflect, self.n_opaque, self.n_refract],
+                [[x, y] for x, y, xdir, ydir in self.lasers], [[xdir, ydir] for x, y, xdir, ydir in self.lasers],
+                [[x, y] for x, y in self.targets])
+
+
+def parse_puzzle(lines, name="<bff>"):
+    '''
+    Parses the lines of a .bff file in a single pass. Coordinates can have any number of digits, and empty lines and comments (from # to the end of the line) are skipped.
+
+    **Parameters**
+        lines: *iterable of str*
+            lines of the file (e.g. the open file itself)
+        name: *str, optional*
+            name of the file, used in the error messages
+
+    **Returns**
+        puzzle: *Puzzle*
+            the puzzle described by the file
+
+    Raises ValueError if a line can not be read, or if the puzzle is not valid (no grid, rows of different lengths, lasers or targets outside of the grid or not on the face of a block...). A point is on a face when exactly one of its coordinates is odd: with an even sum it is a corner of a block or its center, which the beams of the solvers never stop at.
+    '''
+    board = []
+    counts = {'A': 0, 'B': 0, 'C': 0}
+    lasers = []
+    targets = []
+    in_grid = False
+    grid_read = False
+
+    for number, line in enumerate(lines, 1):
+        line = line.split('#', 1)[0].strip()
+        if len(line) == 0:
+            continue
+        if in_grid:
+            if line == "GRID STOP":
+                in_grid = False
+                grid_read = True
+                continue
+            row = ''.join(line.split())
+            if any(cell not in "oxABC" for cell in row):
+                raise ValueError("%s, line %i: unknown cell in grid row %r" % (name, number, line))
+            board.append(row)
+            continue
+        if line == "GRID START":
+            if grid_read:
+                raise ValueError("%s, line %i: the file has more than one grid" % (name, number))
+            in_grid = True
+            continue
+
+        fields = line.split()
+        try:
+            if fields[0] in counts and len(fields) == 2:
+                counts[fields[0]] = int(fields[1])
+            elif fields[0] == 'L' and len(fields) == 5:
+                lasers.append(tuple(int(v) for v in fields[1:]))
+            elif fields[0] == 'P' and len(fields) == 3:
+                targets.append((int(fields[1]), int(fields[2])))
+            else:
+                raise ValueError
+        except ValueError:
+            raise ValueError("%s, line %i: can not read %r" % (name, number, line))
+
+    if not grid_read:
+        raise ValueError("%s: no complete grid (GRID START ... GRID STOP)" % name)
+    if len(board) == 0 or any(len(row) != len(board[0]) for row in board):
+        raise ValueError("%s: the grid rows must all have the same number of cells" % name)
+    if any(n < 0 for n in counts.values()):
+        raise ValueError("%s: negative number of blocks" % name)
+    g_width = 2*len(board[0]) + 1
+    g_height = 2*len(board) + 1
+    for x, y, xdir, ydir in lasers:
+        if not (0 <= x < g_width and 0 <= y < g_height) or xdir not in (-1, 1) or ydir not in (-1, 1):
+            raise ValueError("%s: invalid laser %i %i %i %i" % (name, x, y, xdir, ydir))
+        if (x + y) % 2 == 0:
+            raise ValueError("%s: laser %i %i is not on the face of a block" % (name, x, y))
+    for x, y in targets:
+        if not (0 <= x < g_width and 0 <= y < g_height):
+            raise ValueError("%s: target %i %i is outside of the grid" % (name, x, y))
+        if (x + y) % 2 == 0:
+            raise ValueError("%s: target %i %i is not on the face of a block" % (name, x, y))
+
+    return Puzzle(tuple(board), counts['A'], counts['B'], counts['C'], tuple(lasers), tuple(targets))
+
+
+def read_puzzle(filename):
+    '''
+    Reads a .bff file line by line and returns its Puzzle (see parse_puzzle()).
+    '''
+    with open(filename, 'r') as f:
+        return parse_puzzle(f, filename)
+
+
 def read_file(filename):
     '''
-    This function reads in a .bff file and returns the information on the board to be constructed.
+    This function reads in a .bff file and returns the information on the board to be constructed. The file is parsed by read_puzzle().
 
     **Parameters**
         filename: *str*
@@ -93,73 +241,209 @@ def read_file(filename):
         targets: *list*
             [x,y] coordinates of the taerget points
     '''
-    file = open(filename,'r')
-    raw_string_of_text = file.read()
+    return read_puzzle(filename).as_args()
+
+
+# Compiled puzzle corpus (.lzc file): the puzzles of many .bff files in one binary file, that the workers open with mmap and read in place (see compile_puzzles() and PuzzleCorpus). All the numbers are little endian:
+# - header: magic, version, number of puzzles, then the offset and size of every puzzle record
+# - record: board width and height, block counts (reflect, opaque, refract), number of lasers, targets, positions, restricted and reachable cells, length of the name and flags, followed by
+#   the name (at most CORPUS_MAX_NAME bytes, the flags take the upper 4 bits of its length), the board cells (one byte per cell, row by row), the lasers (x, y, xdir, ydir int16), the targets (x, y int16), the face map (if CORPUS_FACES is set, see face_map())
+#   and the positions, restricted and reachable cells of analyze_board() (x, y uint16 board coordinates, if CORPUS_ANALYSIS is set). Every part starts at an even offset.
+# The workers of solve_batch() use the face maps and the analysis saved instead of computing them again.
+CORPUS_MAGIC = b"LAZR"
+CORPUS_VERSION = 2
+CORPUS_FACES = 1
+CORPUS_ANALYSIS = 2
+CORPUS_MAX_NAME = 0xfff
+CORPUS_HEADER = struct.Struct("<4sHI")
+CORPUS_INDEX = struct.Struct("<QI")
+CORPUS_RECORD = struct.Struct("<11H")
+
+
+def _pad(data):
+    '''
+    Pads bytes to an even length, so that the next part of a corpus record can be read as 16-bit integers.
+    '''
+    return data + b"\0" if len(data) % 2 else data
 
-    file_by_lines = raw_string_of_text.strip().splitlines()
 
-    keep = []
-    discard = []
-    for idx, line in enumerate(file_by_lines):
-        if len(file_by_lines[idx]) == 0:
-            continue
-        if file_by_lines[idx][0] == '#':
-            discard.append(file_by_lines[idx])
-        else:
-            keep.append(file_by_lines[idx])
-
-    start_idx = 0
-    stop_idx = 1
-    reflect = ''
-    refract = ''
-    opaque = ''
-    lasers_pos = []
-    lasers_dir = []
-    targets = []
-    for idx, line in enumerate(keep):
-        if line == "GRID START":
-            start_idx = idx
-        if line == "GRID STOP":
-            stop_idx = idx
-        if line[0] == 'A':
-            if "o" not in line:
-                reflect = line
-        if line[0] =='B':
-            if 'o' not in line:
-                opaque = line
-        if line[0] == 'C':
-            if 'o' not in line:
-                refract = line
-        if line[0] == 'P':
-            line = line.strip('P').replace(' ','')
-            point = [int(line[0]), int(line[1])]
-            targets.append(point)
-        if line[0] == 'L':
-            line = line.strip('L').strip().split(' ')
-            laser_dir = [int(line[2]), int(line[3])]
-            laser_pos = [int(line[0]), int(line[1])]
-            lasers_pos.append(laser_pos)
-            lasers_dir.append(laser_dir)
-
-
-    #get data on grid
-    board_str = keep[start_idx+1:stop_idx]
-    for i in range(len(board_str)):
-        string = board_str[i]
-        string2 = string.replace(' ','')
-        board_str[i] = string2
-
-    # now get the number of blocks for each block type
-    reflect = reflect[1:].strip()
-    opaque = opaque[1:].strip()
-    refract = refract[1:].strip()
-
-    num_blocks = [reflect, opaque, refract]
-    # print(board_str)
-    file.close()
-
-    return board_str, num_blocks, lasers_pos, lasers_dir, targets
+def compile_puzzles(filenames, output, analysis=True):
+    '''
+    Compiles .bff files into a corpus file that can be shared by the workers of a batch (see PuzzleCorpus).
+
+    **Parameters**
+
+        filenames: *list of str*
+            .bff files to compile, their names (without the extension) are kept in the corpus
+        output: *str*
+            corpus file to write (.lzc)
+        analysis: *bool, optional*
+            also save the face map and the cells found by analyze_board() of every puzzle
+
+    **Returns**
 
+        count: *int*
+            number of puzzles written
+
+    Raises ValueError if a file can not be read (see parse_puzzle()) or its name is longer than CORPUS_MAX_NAME bytes.
+    '''
+    records = []
+    for filename in filenames:
+        name = os.path.splitext(os.path.basename(filename))[0].encode("utf-8")
+        if len(name) > CORPUS_MAX_NAME:
+            raise ValueError("%s: the name of the file is too long for a corpus (%i bytes, at most %i)" % (filename, len(name), CORPUS_MAX_NAME))
+        puzzle = read_puzzle(filename)
+        b_width = len(puzzle.board[0])
+        b_height = len(puzzle.board)
+        flags = 0
+        parts = [_pad(name), _pad("".join(puzzle.board).encode("ascii")),
+                 struct.pack("<%ih" % (4*len(puzzle.lasers)), *itertools.chain.from_iterable(puzzle.lasers)),
+                 struct.pack("<%ih" % (2*len(puzzle.targets)), *itertools.chain.from_iterable(puzzle.targets))]
+        positions = restricted = reachable = []
+        if analysis:
+            game = Game.from_puzzle(puzzle)
+            game.create_board()
+            game.create_grid()
+            board_analysis = analyze_board(game)
+            positions = board_analysis.positions
+            restricted = board_analysis.restricted
+            reachable = sorted(board_analysis.reachable)
+            flags = CORPUS_FACES | CORPUS_ANALYSIS
+            parts.append(_pad(face_map(2*b_width + 1, 2*b_height + 1)))
+            cells = positions + restricted + reachable
+            parts.append(struct.pack("<%iH" % (2*len(cells)), *itertools.chain.from_iterable(cells)))
+        header = CORPUS_RECORD.pack(b_width, b_height, puzzle.n_reflect, puzzle.n_opaque, puzzle.n_refract, len(puzzle.lasers), len(puzzle.targets),
+                                    len(positions), len(restricted), len(reachable), len(name) | flags << 12)
+        records.append(header + b"".join(parts))
+
+    offset = CORPUS_HEADER.size + CORPUS_INDEX.size*len(records)
+    with open(output, "wb") as f:
+        f.write(CORPUS_HEADER.pack(CORPUS_MAGIC, CORPUS_VERSION, len(records)))
+        for record in records:
+            f.write(CORPUS_INDEX.pack(offset, len(record)))
+            offset += len(record)
+        for record in records:
+            f.write(record)
+    return len(records)
+
+
+class PuzzleCorpus():
+    '''
+    Corpus file written by compile_puzzles(), opened with mmap: the pages are shared by all the processes that open the file, and the puzzles are only decoded when they are used. The face maps and the cells of the analysis are returned as memoryviews of the file, without copying them.
+
+    The memoryviews must be released (or deleted) before closing the corpus.
+    '''
+
+    def __init__(self, filename):
+        self.filename = filename
+        with open(filename, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+        magic, version, self._count = CORPUS_HEADER.unpack_from(self._view, 0)
+        if magic != CORPUS_MAGIC:
+            self.close()
+            raise ValueError("%s is not a puzzle corpus" % filename)
+        if version != CORPUS_VERSION:
+            self.close()
+            raise ValueError("%s is a puzzle corpus of version %i, only version %i can be read" % (filename, version, CORPUS_VERSION))
+
+    def __len__(self):
+        return self._count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._view.release()
+        self._mmap.close()
+
+    def _record(self, index):
+        '''
+        Returns the header of a record and the offsets of its parts.
+        '''
+        if not 0 <= index < self._count:
+            raise IndexError("puzzle %i is not in %s" % (index, self.filename))
+        start = CORPUS_HEADER.size + CORPUS_INDEX.size*index
+        offset = CORPUS_INDEX.unpack_from(self._view, start)[0]
+        header = CORPUS_RECORD.unpack_from(self._view, offset)
+        b_width, b_height, n_lasers, n_targets, name_len = header[0], header[1], header[5], header[6], header[10] & CORPUS_MAX_NAME
+        offsets = {"name": offset + CORPUS_RECORD.size}
+        offsets["board"] = offsets["name"] + name_len + name_len % 2
+        offsets["lasers"] = offsets["board"] + b_width*b_height + b_width*b_height % 2
+        offsets["targets"] = offsets["lasers"] + 8*n_lasers
+        offsets["faces"] = offsets["targets"] + 4*n_targets
+        n_faces = (2*b_width + 1)*(2*b_height + 1) if header[10] >> 12 & CORPUS_FACES else 0
+        offsets["cells"] = offsets["faces"] + n_faces + n_faces % 2
+        return header, offsets
+
+    def name(self, index):
+        '''
+        Returns the name of a puzzle (the name of its .bff file).
+        '''
+        header, offsets = self._record(index)
+        return bytes(self._view[offsets["name"]:offsets["name"] + (header[10] & CORPUS_MAX_NAME)]).decode("utf-8")
+
+    def __getitem__(self, index):
+        '''
+        Decodes a puzzle of the corpus into a Puzzle.
+        '''
+        header, offsets = self._record(index)
+        b_width, b_height, n_reflect, n_opaque, n_refract, n_lasers, n_targets = header[:7]
+        cells = bytes(self._view[offsets["board"]:offsets["board"] + b_width*b_height]).decode("ascii")
+        board = tuple(cells[i:i + b_width] for i in range(0, len(cells), b_width))
+        values = struct.unpack_from("<%ih" % (4*n_lasers + 2*n_targets), self._view, offsets["lasers"])
+        lasers = tuple(values[i:i + 4] for i in range(0, 4*n_lasers, 4))
+        targets = tuple(values[i:i + 2] for i in range(4*n_lasers, len(values), 2))
+        return Puzzle(board, n_reflect, n_opaque, n_refract, lasers, targets)
+
+    def __iter__(self):
+        for index in range(self._count):
+            yield self[index]
+
+    def face_map(self, index):
+        '''
+        Returns the face map of a puzzle (as face_map() does) as a memoryview of the file, or None if it was not saved.
+        '''
+        header, offsets = self._record(index)
+        if not header[10] >> 12 & CORPUS_FACES:
+            return None
+        return self._view[offsets["faces"]:offsets["faces"] + (2*header[0] + 1)*(2*header[1] + 1)]
+
+    def candidates(self, index):
+        '''
+        Returns the positions, the restricted cells and the reachable cells that analyze_board() found for a puzzle, or None if they were not saved. They are memoryviews of uint16 with the x and y board coordinates of every cell one after the other (on big endian machines they are decoded into arrays instead).
+        '''
+        header, offsets = self._record(index)
+        if not header[10] >> 12 & CORPUS_ANALYSIS:
+            return None
+        views = []
+        start = offsets["cells"]
+        for n in header[7:10]:
+            views.append(self._view[start:start + 4*n])
+            start += 4*n
+        if sys.byteorder != "little":
+            return tuple(array.array("H", struct.unpack("<%iH" % (len(view)//2), view)) for view in views)
+        return tuple(view.cast("H") for view in views)
+
+    def analysis(self, index):
+        '''
+        Returns the BoardAnalysis saved for a puzzle (as analyze_board() returns it), or None if it was not saved.
+        '''
+        cells = self.candidates(index)
+        if cells is None:
+            return None
+        positions, restricted, reachable = ([[c[i], c[i + 1]] for i in range(0, len(c), 2)] for c in cells)
+        del cells
+        return board_analysis(positions, restricted, set(tuple(p) for p in reachable))
+
+
+# Loggers of the different parts of the solver. Use set_log_level() (or the logging module) to turn them on.
+LOG_SHOOT = logging.getLogger("lazor.shoot")
+LOG_SOLVE = logging.getLogger("lazor.solve")
+LOG_RENDER = logging.getLogger("lazor.render")
 
 VALID = 0
 INVALID = 1
@@ -181,145 +465,1148 @@ COLORS = {
 
 }
 
-def solve_game(filename):
+def valid_positions(game):
     '''
-    Function that solves the game. This function takes a game as an input (this game object already has all the blocks available placed in a specific arrangement) and turns on all the lasers (shoot()). It will then calculate/obtain all the path trajectories from each laser and compare the points in the trajectories to the points that we are targetting. If all the target points are included in the trajectories then the game is solved and the function returns an image representation (or text to simplify) showing which block arrangement solves the puzzle. If any of the target points is missing in the trajectories then the puzzle is not solved, the function will regenerate the game() object and check to see if this new arrangement solves the board.
+    Returns the [x, y] board coordinates of every cell in the board of a game where a block can be placed (i.e. the 'o' cells), in row order.
 
     **Parameters**
 
-        filename: *str*
-            filename plus extension of the file you want to read the game information from.
+        game: *Game() object*
+            game with its board already created (create_board())
+
+    **Returns**
+
+        positions: *list of lists*
+            [x, y] coordinates of the VALID cells of the board
+    '''
+    positions = []
+    for y in range(len(game.board)):
+        for x in range(len(game.board[0])):
+            if game.board[y][x] == VALID:
+                positions.append([x, y])
+    return positions
+
+
+# result of analyze_board(). positions and restricted can be given to iter_placements()
+BoardAnalysis = collections.namedtuple("BoardAnalysis", ["positions", "restricted", "reachable", "parking"])
+
+
+def analyze_board(game):
+    '''
+    Static analysis of a board before any block is put, shared by all the solve modes. It finds:
+
+    - reachable: the VALID cells that a laser beam can ever head into, whatever the placement of the blocks. The beams are followed from the lasers through the fixed blocks of the board and through every outcome an empty cell could have (the beam goes through it, is reflected if there are REFLECT or REFRACT blocks available, or is absorbed). A block put in any other cell never changes the beams.
+    - restricted: the cells where a REFLECT or OPAQUE block keeps a target from being hit, because every beam that can get to the target goes through that cell (e.g. the cell next to a target on the edge of the board).
+    - parking: the cells that are not reachable are all equivalent, so only as many of them as there are blocks are kept, to put the blocks that are not needed to solve the board. The rest are dominated by them.
+
+    **Parameters**
+
+        game: *Game() object*
+            game with its board and grids created, before putting any block
+
+    **Returns**
+
+        analysis: *BoardAnalysis*
+            positions: [x, y] board coordinates worth trying (reachable or parking), in row order
+            restricted: [x, y] board coordinates where OPAQUE and REFLECT blocks should not be put
+            reachable: set of (x, y) board coordinates that a beam can head into
+            parking: [x, y] board coordinates of the unreachable cells kept
+    '''
+    can_reflect = game.n_reflect + game.n_refract > 0
+    reachable = set()
+    # grid point -> board cells crossed by the beams that get to that point (None when no block can stop the beam: a laser that starts there, or a beam reflected on its way there)
+    arrivals = {}
+    seen = set()
+    pending = []
+    for pos, direction in zip(game.lasers_pos, game.lasers_dir):
+        pending.append((pos[0], pos[1], direction[0], direction[1]))
+        arrivals.setdefault(tuple(pos), set()).add(None)
+
+    while len(pending) > 0:
+        state = pending.pop()
+        if state in seen:
+            continue
+        seen.add(state)
+        x, y, xdir, ydir = state
+        face = game.get_block_face(x, y)
+        if face == 1:
+            reflected = (xdir, -ydir)
+        else:
+            reflected = (-xdir, ydir)
+
+        # directions the beam can go in after the block it heads into
+        block = game.facing_block(x, y, xdir, ydir)
+        if block == VALID:
+            cx, cy = (x + xdir, y) if face == 2 else (x, y + ydir)
+            reachable.add(((cx - 1)//2, (cy - 1)//2))
+            dirs = [(xdir, ydir), reflected] if can_reflect else [(xdir, ydir)]
+        elif block == REFLECT:
+            dirs = [reflected]
+        elif block == OPAQUE:
+            dirs = []
+        elif block == REFRACT:
+            dirs = [(xdir, ydir), reflected]
+        else:
+            dirs = [(xdir, ydir)]
+
+        for dx, dy in dirs:
+            next_x = x + dx
+            next_y = y + dy
+            if not game.within_bounds(game.grid, next_x, next_y):
+                continue
+            # the cell the beam goes through to get to the next point. A reflected beam goes on to the next point without looking at any other block
+            if (dx, dy) == (xdir, ydir):
+                cx, cy = (x + dx, y) if face == 2 else (x, y + dy)
+                arrivals.setdefault((next_x, next_y), set()).add(((cx - 1)//2, (cy - 1)//2))
+            else:
+                arrivals.setdefault((next_x, next_y), set()).add(None)
+            pending.append((next_x, next_y, dx, dy))
+
+    restricted = set()
+    for target in game.targets:
+        cells = arrivals.get(tuple(target), set())
+        if len(cells) == 1 and None not in cells:
+            restricted.update(cells)
+
+    n_blocks = game.n_refract + game.n_reflect + game.n_opaque
+    valid = valid_positions(game)
+    parking = [p for p in valid if tuple(p) not in reachable and tuple(p) not in restricted][:n_blocks]
+    parked = set(tuple(p) for p in parking)
+    positions = [p for p in valid if tuple(p) in reachable or tuple(p) in parked]
+
+    return board_analysis(positions, [list(p) for p in sorted(restricted)], reachable)
+
+
+def board_analysis(positions, restricted, reachable):
+    '''
+    Builds the BoardAnalysis of analyze_board() from its positions, restricted and reachable cells (e.g. the ones saved in a PuzzleCorpus): the parking cells are the positions that are not reachable.
+    '''
+    parking = [p for p in positions if tuple(p) not in reachable]
+    return BoardAnalysis(positions, restricted, reachable, parking)
+
+
+def iter_placements(positions, n_refract, n_reflect, n_opaque, restricted=(), prefix=None):
+    '''
+    Generator that walks every distinct placement of the available blocks over the given board positions exactly once. Blocks of the same type are interchangeable, so the positions for each block type are drawn as combinations (never permutations): first the REFRACT blocks, then the REFLECT blocks out of the positions left, then the OPAQUE blocks.
+
+    The placements can be split by their first blocks: walking the placements that start with every prefix returned by placement_prefixes() walks every placement exactly once.
+
+    **Parameters**
+
+        positions: *list of lists*
+            [x, y] board coordinates where a block can be put
+        n_refract: *int*
+            number of refractive blocks available
+        n_reflect: *int*
+            number of reflective blocks available
+        n_opaque: *int*
+            number of opaque blocks available
+        restricted: *list of lists, optional*
+            [x, y] board coordinates where REFLECT and OPAQUE blocks can not be put
+        prefix: *list of tuples, optional*
+            (x, y, block_type) of the first blocks, in the order of the placements (a placement of fewer blocks yielded by this function, see placement_prefixes()). Only the placements that start with these blocks are yielded (all of them by default)
+
+    **Yields**
+
+        placement: *list of tuples*
+            (x, y, block_type) for every block available
+    '''
+    positions = [tuple(p) for p in positions]
+    restricted = set(tuple(p) for p in restricted)
+
+    # positions of the blocks of every type fixed by the prefix
+    fixed = {REFRACT: (), REFLECT: (), OPAQUE: ()}
+    for x, y, block_type in prefix or ():
+        fixed[block_type] += ((x, y),)
+
+    def combinations(cells, n, block_type):
+        start = fixed[block_type]
+        if len(start) == 0:
+            return itertools.combinations(cells, n)
+        if len(start) > n or any(p not in cells for p in start):
+            return ()
+        indices = [cells.index(p) for p in start]
+        if any(i >= j for i, j in zip(indices, indices[1:])):
+            return ()
+        return (start + others for others in itertools.combinations(cells[indices[-1]+1:], n - len(start)))
+
+    for refract_cells in combinations(positions, n_refract, REFRACT):
+        left = [p for p in positions if p not in refract_cells and p not in restricted]
+        for reflect_cells in combinations(left, n_reflect, REFLECT):
+            rest = [p for p in left if p not in reflect_cells]
+            for opaque_cells in combinations(rest, n_opaque, OPAQUE):
+                placement = [(p[0], p[1], REFRACT) for p in refract_cells]
+                placement.extend((p[0], p[1], REFLECT) for p in reflect_cells)
+                placement.extend((p[0], p[1], OPAQUE) for p in opaque_cells)
+                yield placement
+
+
+def random_placement(positions, n_refract, n_reflect, n_opaque, restricted=()):
+    '''
+    Draws a random placement of the available blocks, in the same canonical form as iter_placements(): the positions of each block type are a random combination, in the order of positions. Two placements that only differ by swapping blocks of the same type are the same placement.
+
+    The REFLECT and OPAQUE blocks are drawn first, out of the positions that are not restricted, and the REFRACT blocks out of the positions left, so every placement has the same chance of being drawn. There must be at least one placement (see count_placements()).
+
+    **Parameters**
+
+        positions, n_refract, n_reflect, n_opaque, restricted:
+            see iter_placements()
 
+    **Returns**
+
+        placement: *list of tuples*
+            (x, y, block_type) for every block available
+    '''
+    positions = [tuple(p) for p in positions]
+    restricted = set(tuple(p) for p in restricted)
+    cells = {}
+    left = [p for p in positions if p not in restricted]
+
+    for block_type, n in ((REFLECT, n_reflect), (OPAQUE, n_opaque), (REFRACT, n_refract)):
+        if block_type == REFRACT:
+            # REFRACT blocks can also go in the restricted positions
+            taken = set(cells[REFLECT] + cells[OPAQUE])
+            left = [p for p in positions if p not in taken]
+        chosen = sorted(random.sample(range(len(left)), n))
+        cells[block_type] = [left[i] for i in chosen]
+        chosen = set(chosen)
+        left = [left[i] for i in range(len(left)) if i not in chosen]
+
+    # same order as iter_placements(): REFRACT, REFLECT and then OPAQUE
+    return [(p[0], p[1], block_type) for block_type in (REFRACT, REFLECT, OPAQUE) for p in cells[block_type]]
+
+
+def placement_prefixes(positions, n_refract, n_reflect, n_opaque, restricted=(), parts=1):
+    '''
+    Splits the placements of iter_placements() into at least the given number of parts (if there are that many placements). Every part is given by a prefix, the placement of the first m blocks in the order of iter_placements(), with m as small as possible. The parts that start with the first positions are the largest ones, so they come first.
+
+    **Parameters**
+
+        positions, n_refract, n_reflect, n_opaque, restricted:
+            see iter_placements()
+        parts: *int, optional*
+            min number of parts
+
+    **Returns**
+
+        prefixes: *list of lists of tuples*
+            the prefix of every part (some of them may not start any placement)
+    '''
+    counts = (n_refract, n_reflect, n_opaque)
+    for m in range(sum(counts) + 1):
+        # the first m blocks: the REFRACT blocks, then the REFLECT blocks and then the OPAQUE blocks
+        first = []
+        left = m
+        for n in counts:
+            first.append(min(n, left))
+            left -= first[-1]
+        if m == sum(counts) or count_placements(positions, *first, restricted) >= parts:
+            return list(iter_placements(positions, *first, restricted))
+
+
+def count_placements(positions, n_refract, n_reflect, n_opaque, restricted=()):
+    '''
+    Returns the number of placements iter_placements() will yield for the same parameters, i.e. the worst case number of iterations of the exhaustive search.
+    '''
+    restricted = set(tuple(p) for p in restricted)
+    n_restricted = len([p for p in positions if tuple(p) in restricted])
+    n_free = len(positions) - n_restricted
+
+    total = 0
+    # k is the number of refractive blocks that sit in restricted positions
+    for k in range(n_refract+1):
+        free_left = n_free - (n_refract - k)
+        if free_left < 0:
+            continue
+        total += (math.comb(n_restricted, k) * math.comb(n_free, n_refract - k)
+                  * math.comb(free_left, n_reflect)
+                  * math.comb(max(free_left - n_reflect, 0), n_opaque))
+    return total
+
+
+def set_log_level(level, component=None):
+    '''
+    Sets the level of the solver loggers.
+
+    **Parameters**
+
+        level: *int*
+            logging level (ex. logging.DEBUG, logging.INFO)
+        component: *str, optional*
+            "shoot" (laser trajectories), "solve" (progress of the solvers) or "render" (solution images). All the loggers are set if not given.
+    '''
+    if component is None:
+        logging.getLogger("lazor").setLevel(level)
+    else:
+        logging.getLogger("lazor." + component).setLevel(level)
+
+
+def log_solution(board, iterations):
+    '''
+    Logs the number of iterations used to solve a board and the winning board.
+    '''
+    LOG_SOLVE.info("you solved it in %i iterations!", iterations)
+    LOG_SOLVE.info('the winning board is:')
+    for row in board:
+        LOG_SOLVE.info('%s', row)
+
+
+# face maps by grid size (see face_map())
+_FACE_MAPS = {}
+
+
+def face_map(g_width, g_height):
+    '''
+    Returns the faces grid of a grid of the given size, flattened row by row: 1 for the horizontal faces of the blocks (x odd, y even), 2 for the vertical faces (x even, y odd) and 0 for the centers and corners. It only depends on the size of the grid, so it is computed once per size and shared (read-only) by all the games.
+
+    **Parameters**
+
+        g_width: *int*
+            width of the grid (2*board width + 1)
+        g_height: *int*
+            height of the grid (2*board height + 1)
+
+    **Returns**
+
+        faces: *bytes*
+            face of the grid point x, y at index y*g_width + x
+    '''
+    faces = _FACE_MAPS.get((g_width, g_height))
+    if faces is None:
+        faces = bytearray(g_width*g_height)
+        for y in range(g_height):
+            for x in range(g_width):
+                if x % 2 == 1 and y % 2 == 0:
+                    faces[y*g_width + x] = 1
+                elif x % 2 == 0 and y % 2 == 1:
+                    faces[y*g_width + x] = 2
+        faces = _FACE_MAPS[(g_width, g_height)] = bytes(faces)
+    return faces
+
+
+def share_face_map(g_width, g_height, faces):
+    '''
+    Makes face_map() return the given face map (e.g. a memoryview of a PuzzleCorpus, that must then stay open) for the grids of that size, unless one is already known.
+    '''
+    _FACE_MAPS.setdefault((g_width, g_height), faces)
+
+
+def point_to_blocks(x, y, b_width, b_height):
+    '''
+    Returns the board positions of the blocks that share the face at the x and y position of the grid (one block for faces on the edge of the board, two otherwise).
+    '''
+    # grid to board: n=(m-1)/2 for the coordinate at the center of the block, the other coordinate is on the face shared by two blocks
+    if x % 2 == 1:
+        neighbours = [((x-1)//2, y//2 - 1), ((x-1)//2, y//2)]
+    else:
+        neighbours = [(x//2 - 1, (y-1)//2), (x//2, (y-1)//2)]
+    return [(bx, by) for bx, by in neighbours if 0 <= bx < b_width and 0 <= by < b_height]
+
+
+# directions a laser can go in, in the order used to pack the states of TransitionTable
+DIRECTIONS = ((1, 1), (1, -1), (-1, 1), (-1, -1))
+
+# number of bits used by every block of the board in a layout key (block values go from 0 to 4)
+LAYOUT_BITS = 3
+
+
+def layout_key(board):
+    '''
+    Returns a compact key for a board: an integer with LAYOUT_BITS bits for every block of the board, in row order. Two boards have the same key only if they have the same blocks in the same positions, and the key can be put in a set, unlike the board (list of lists).
+
+    **Parameters**
+
+        board: *list of lists*
+            board of a game (see Game.create_board())
+
+    **Returns**
+
+        key: *int*
+            the packed board
+    '''
+    key = 0
+    shift = 0
+    for row in board:
+        for value in row:
+            key |= value << shift
+            shift += LAYOUT_BITS
+    return key
+
+
+class VisitedLayouts():
+    '''
+    Set of layout keys (see layout_key()) of the boards already checked by a solver, so that a repeated board can be skipped before shooting the lasers.
+
+    If max_size is given, the oldest keys are forgotten once there are more than max_size of them, so the memory used stays bounded. A forgotten board can then be checked again.
+    '''
+
+    def __init__(self, max_size=None):
+        self.max_size = max_size
+        self.keys = collections.OrderedDict()
+        self.evicted = 0
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key):
+        return key in self.keys
+
+    def add(self, key):
+        '''
+        Adds a key to the set. Returns True if the key is new, False if it was already in the set.
+        '''
+        if key in self.keys:
+            return False
+        self.keys[key] = None
+        if self.max_size is not None and len(self.keys) > self.max_size:
+            self.keys.popitem(last=False)
+            self.evicted += 1
+        return True
+
+
+class SolveStats():
+    '''
+    Counters of a solve, filled in by solve_game() (and the solve_* functions) when an instance is given to them.
+
+    - iterations: number of boards checked (as logged when the board is solved)
+    - steps: number of steps of the laser beams traced, a step being a grid point and direction that a beam goes through (see Game.steps, TransitionTable.steps and BeamTrace.steps). It is counted the same way in every mode, so the work of the modes can be compared
+    - targets_hit, n_targets, timed_out: for the anytime mode, the targets hit by the board returned, the number of targets of the board and whether the time budget ran out (see solve_anytime())
+
+    With profile=True the stages of every board checked are also timed (timers, in seconds, and the number of times each stage ran in counters), and the lasers shot by Game.shoot() count their steps, reflections, refractions and absorptions. The stages are create_board, put_blocks, create_grid, shoot and hit_all_targets in the random mode, put_blocks and hit_all_targets (on the TransitionTable) in the exhaustive and parallel modes (summed over all the workers), put_blocks and targets_hit in the anytime mode, and put_blocks (putting or removing one block) and hit_all_targets (on the BeamTrace) in the backtrack mode. Profiling adds a couple of clock reads per stage, nothing is done when it is off.
+    '''
+
+    def __init__(self, profile=False):
+        self.mode = None
+        self.solved = False
+        self.cached = False # the solution was found in a SolutionCache
+        self.iterations = 0
+        self.steps = 0
+        self.targets_hit = 0
+        self.n_targets = 0
+        self.timed_out = False
+        self.profile = profile
+        self.counters = collections.Counter()
+        self.timers = collections.defaultdict(float)
+        self._lap_start = 0.0
+
+    def lap(self, stage=None):
+        '''
+        Adds the time since the previous lap to the timer of the given stage (just starts a new lap if no stage is given).
+        '''
+        now = time.perf_counter()
+        if stage is not None:
+            self.timers[stage] += now - self._lap_start
+            self.counters[stage] += 1
+        self._lap_start = now
+
+    def merge(self, other):
+        '''
+        Adds the timers and counters of another SolveStats (e.g. of a part of the search run by a worker process) to these ones.
+        '''
+        for stage, seconds in other.timers.items():
+            self.timers[stage] += seconds
+        self.counters.update(other.counters)
+
+    def as_dict(self):
+        '''
+        Returns the counters as a dictionary (e.g. to save them as JSON).
+        '''
+        stats = dict((k, v) for k, v in vars(self).items() if not k.startswith('_'))
+        stats["counters"] = dict(self.counters)
+        stats["timers"] = dict(self.timers)
+        return stats
+
+    def dump(self, file=None):
+        '''
+        Writes a report of the counters and timers to a file (sys.stdout by default).
+        '''
+        file = file or sys.stdout
+        file.write("mode: %s, solved: %s, %i iterations, %i steps\n" % (self.mode, self.solved, self.iterations, self.steps))
+        for stage, seconds in sorted(self.timers.items(), key=lambda t: -t[1]):
+            calls = self.counters[stage]
+            file.write("  %-16s %8i calls %10.4f s %10.2f us/call\n" % (stage, calls, seconds, 1e6 * seconds / max(calls, 1)))
+        for name, count in sorted(self.counters.items()):
+            if name not in self.timers:
+                file.write("  %-16s %8i\n" % (name, count))
+
+
+def puzzle_key(board_str, num_blocks, lasers_pos, lasers_dir, targets):
+    '''
+    Returns a hash of a puzzle (as returned by read_file()) that identifies it whatever the file it was read from: the order of the lasers and of the targets in the file, and missing block counts, do not change it.
+
+    **Returns**
+
+        key: *str*
+            hexadecimal SHA-256 hash of the puzzle
+    '''
+    puzzle = {
+        "board": list(board_str),
+        "blocks": [int(n or 0) for n in num_blocks],
+        "lasers": sorted([p[0], p[1], d[0], d[1]] for p, d in zip(lasers_pos, lasers_dir)),
+        "targets": sorted(set((t[0], t[1]) for t in targets)),
+    }
+    return hashlib.sha256(json.dumps(puzzle, sort_keys=True).encode()).hexdigest()
+
+
+class SolutionCache():
+    '''
+    Solutions of the puzzles solved so far, saved in a sqlite database so that they are kept between runs. The puzzles are identified by puzzle_key(), so the same puzzle in two different files is only solved once.
+
+    At most max_entries solutions are kept: when the cache is full, the solutions that were used the longest time ago are removed (LRU).
+    '''
+
+    def __init__(self, filename="lazor_cache.sqlite", max_entries=10000):
+        '''
+        Opens (or creates) the cache database.
+
+        **Parameters**
+
+            filename: *str, optional*
+                sqlite database file (":memory:" for a cache that is not saved)
+            max_entries: *int, optional*
+                max number of solutions kept
+        '''
+        self.max_entries = max_entries
+        self.db = sqlite3.connect(filename)
+        # the cache can be rebuilt, so commits do not need to wait for the disk
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=OFF")
+        self.db.execute("CREATE TABLE IF NOT EXISTS solutions (key TEXT PRIMARY KEY, board TEXT, stats TEXT, last_used REAL)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS solutions_last_used ON solutions (last_used)")
+        self.db.commit()
+
+    def get(self, key):
+        '''
+        Returns the winning board and the stats (as a dictionary, see SolveStats.as_dict()) of the solve of a puzzle, or None if the puzzle is not in the cache.
+        '''
+        row = self.db.execute("SELECT board, stats FROM solutions WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        with self.db:
+            self.db.execute("UPDATE solutions SET last_used = ? WHERE key = ?", (time.time(), key))
+        return json.loads(row[0]), json.loads(row[1])
+
+    def put(self, key, board, stats=None):
+        '''
+        Saves the winning board of a puzzle and the stats of its solve, and removes the least recently used solutions if the cache is full.
+        '''
+        with self.db:
+            self.db.execute("INSERT OR REPLACE INTO solutions VALUES (?, ?, ?, ?)",
+                            (key, json.dumps(board), json.dumps(stats.as_dict() if stats is not None else {}), time.time()))
+            self.db.execute("DELETE FROM solutions WHERE key IN (SELECT key FROM solutions ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                            (self.max_entries,))
+
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM solutions").fetchone()[0]
+
+    def close(self):
+        self.db.close()
+
+
+def shoot_placement(puzzle, placement):
+    '''
+    Creates a new Game() instance with the blocks put in the given positions and shoots all its lasers.
+
+    **Parameters**
+
+        puzzle: *Puzzle*
+            the puzzle (see read_puzzle())
+        placement: *list of tuples*
+            (x, y, block_type) for every block to put in the board
+
+    **Returns**
+
+        game: *Game() object*
+            game with all the lasers shot
+    '''
+    game = Game.from_puzzle(puzzle)
+    game.create_board()
+    for x, y, block_type in placement:
+        game.put_block(Block(block_type), x, y)
+    game.create_grid()
+    game.shoot_all()
+    return game
+
+
+def solve_exhaustive(puzzle, stats=None, analysis=None, stop=None, render=True):
+    '''
+    Deterministic version of solve_game(). Instead of drawing random positions, every distinct placement of the available blocks over the valid board positions is checked exactly once (see iter_placements()). The worst case number of iterations is known before starting, and if no placement solves the board then the board can not be solved.
+
+    **Parameters**
+
+        puzzle: *Puzzle*
+            the puzzle to solve (see read_puzzle())
+        analysis: *BoardAnalysis, optional*
+            analysis of the board, if it is already known (see analyze_board())
+        stop: *multiprocessing.Event, optional*
+            if given, the search gives up as soon as the event is set (see first_solution())
+
+        render: *bool, optional*
+            save an image of the solution in the working directory (see save_board()). Processes that only need the board turn it off, so they never load the image libraries
     **Returns**
         solved: *bool*
-            True if game was solved, False if it was not
+            True if game was solved, False if no placement solves it
         board: *list*
-            Board representation of the solution
+            Board representation of the solution (the empty board if it was not solved)
+    '''
+    game0 = Game.from_puzzle(puzzle)
+    game0.create_board()
+    game0.create_grid()
+
+    # only the positions that can change the beams, plus a few to put the blocks not needed (see analyze_board())
+    positions, restricted = (analysis or analyze_board(game0))[:2]
+    total = count_placements(positions, game0.n_refract, game0.n_reflect, game0.n_opaque, restricted)
+    LOG_SOLVE.info('checking %i possible placements', total)
+
+    # the board is compiled once, and consecutive placements only differ in a few blocks of the table
+    table = TransitionTable(game0)
+    placements = iter_placements(positions, game0.n_refract, game0.n_reflect, game0.n_opaque, restricted)
+    placement, iterations = first_solution(table, placements, stop, stats)
+    if stats is not None:
+        stats.iterations += iterations
+        stats.steps += table.steps
+
+    if placement is not None:
+        game1 = shoot_placement(puzzle, placement)
+        if render:
+            save_board(game1.board, blockSize=100)
+        log_solution(game1.board, iterations)
+        return True, game1.board
 
+    if stop is not None and stop.is_set():
+        LOG_SOLVE.info('search stopped after %i of the %i possible placements', iterations, total)
+    else:
+        LOG_SOLVE.info('none of the %i possible placements solves the board', total)
+    game0.create_board()
+    return False, game0.board
 
+
+def solve_anytime(puzzle, time_budget=None, stats=None, analysis=None, stop=None, render=True):
     '''
+    Time-budgeted version of solve_exhaustive(): the placements are checked in the same order until one solves the board or the time budget runs out. Every placement is scored by the number of targets its lasers hit, and when the time is up the best placement found so far is returned instead of a solution.
 
-    board_str, num_blocks, lasers_pos, lasers_dir, targets = read_file(filename)
-    
-    solved = False
+    **Parameters**
+
+        puzzle: *Puzzle*
+            the puzzle to solve (see read_puzzle())
+        time_budget: *float, optional*
+            wall-clock seconds the search can take. The clock is read every STOP_CHECK_INTERVAL placements, so it can run over by the time of that many placements. No limit by default (the search then ends as the exhaustive mode does).
+        stats: *SolveStats, optional*
+            if given, it is filled in with the counters of the search, the targets hit by the board returned and whether the time ran out
+        analysis: *BoardAnalysis, optional*
+            analysis of the board, if it is already known (see analyze_board())
+        stop: *multiprocessing.Event, optional*
+            if given, the search gives up as soon as the event is set, as if the time was up (it is checked with the clock)
+
+        render: *bool, optional*
+            save an image of the solution in the working directory (see save_board()). Processes that only need the board turn it off, so they never load the image libraries
+    **Returns**
+        solved: *bool*
+            True if game was solved, False if it was not (in the time budget, or at all if the time did not run out)
+        board: *list*
+            Board representation of the solution, or of the placement hitting the most targets (the first one found) if it was not solved
+    '''
+    deadline = None if time_budget is None else time.perf_counter() + time_budget
+    game0 = Game.from_puzzle(puzzle)
+    game0.create_board()
+    game0.create_grid()
+
+    positions, restricted = (analysis or analyze_board(game0))[:2]
+    table = TransitionTable(game0)
+    profile = stats is not None and stats.profile
+    best_hits = -1
+    best = None
     iterations = 0
-    MAX_ITERATIONS = 10000000
-    board_List = []
+    timed_out = False
+    for placement in iter_placements(positions, game0.n_refract, game0.n_reflect, game0.n_opaque, restricted):
+        iterations += 1
+        if profile:
+            stats.lap()
+        table.set_placement(placement)
+        if profile:
+            stats.lap("put_blocks")
+        hits = table.targets_hit()
+        if profile:
+            stats.lap("targets_hit")
+        if hits > best_hits:
+            best_hits = hits
+            best = placement
+            if hits == table.n_targets:
+                break
+        # at least one placement is always checked
+        if iterations % STOP_CHECK_INTERVAL == 0 and ((deadline is not None and time.perf_counter() >= deadline) or (stop is not None and stop.is_set())):
+            timed_out = True
+            break
+
+    solved = best is not None and best_hits == table.n_targets
+    if stats is not None:
+        stats.iterations += iterations
+        stats.steps += table.steps
+        stats.targets_hit = max(best_hits, 0)
+        stats.n_targets = table.n_targets
+        stats.timed_out = timed_out
+
+    if best is None:
+        LOG_SOLVE.info('there is no placement of the blocks to check')
+        game0.create_board()
+        return False, game0.board
+    game1 = shoot_placement(puzzle, best)
+    if solved:
+        if render:
+            save_board(game1.board, blockSize=100)
+        log_solution(game1.board, iterations)
+    elif timed_out:
+        LOG_SOLVE.info('time budget used up after %i placements, the best board hits %i of %i targets', iterations, best_hits, table.n_targets)
+    else:
+        LOG_SOLVE.info('none of the %i possible placements solves the board, the best one hits %i of %i targets', iterations, best_hits, table.n_targets)
+    return solved, game1.board
 
-    # game1 = Game(board_str, num_blocks, lasers_pos, lasers_dir, targets)
-    # game1.create_board()
-    # game1.create_grid()
-    # board_List.append(game1.board) #appends the empty board to initialize board_List
 
-    while solved == False and iterations <= MAX_ITERATIONS:
-        game1 = Game(board_str, num_blocks, lasers_pos, lasers_dir, targets)
-        game1.create_board()
-        game1.create_grid()
+# how many placements (or boards) a search checks between two looks at its stop event (and solve_anytime() between two looks at the clock)
+STOP_CHECK_INTERVAL = 256
 
-        # put the blocks available at particular positions. This is the logic that we need to figure out. 
-        # put transparent blocks first, then reflective ones. Idk in what order the opaques should go (after transparent). The blocks should be in this order in the available_blocks list.
 
-        # RANDOM LOGIC (NOT COMPLETELY RANDOM - has some positioning constraints)
+def first_solution(table, placements, stop=None, stats=None):
+    '''
+    Checks the given placements one after the other on a TransitionTable, and returns the first one that solves the board. Only the blocks that differ from the previous placement are updated in the table.
 
-        # for each block available get an x and y value within the board list. 
-        rand_x = random.randint(0, len(game1.board[0])-1)
-        rand_y = random.randint(0, len(game1.board)-1)
-        next_rand = [[rand_x, rand_y]]
+    **Parameters**
 
-        # if the block at rand_x, rand_y is VALID put block there. Else get another random number for x and y 
-        # if a target is on the edge of the board, then the block adjacent to the target becomes invalid for reflect and opaque blocks. If the target is not on the edge of the board, then the invalid block is the one adjacent to it from the side that the laser beam is coming.
+        table: *TransitionTable() object*
+            table of the board without any blocks put
+        placements: *iterable*
+            placements to check, as yielded by iter_placements()
+        stop: *multiprocessing.Event, optional*
+            if given, the search gives up as soon as the event is set (it is checked every STOP_CHECK_INTERVAL placements)
+        stats: *SolveStats, optional*
+            times the stages of every placement if its profile is on
 
-        all_invalid_adj_blocks = []
-
-        border_xs = [0, len(game1.grid[0])-1]
-        border_ys = [0, len(game1.grid)-1]
-        for i in targets:
-            # print(i)
-            if i[0] in border_xs or i[1] in border_ys:
-                face = game1.grid_faces[i[1]][i[0]]
-                grid_points = []
-                if face == 1:
-                    grid_points = [[i[0],i[1]+1], [i[0],i[1]-1]]
-                if face == 2:
-                    grid_points = [[i[0]+1,i[1]], [i[0]-1,i[1]]]
-                # board to grid: m=2n+1
-                # grid to board: n=(m-1)/2 (*use this one for this case*)
-                # where m and n are the corresponding coordinates in the grid and board respectively
-                converted_to_blocks = [[int((grid_points[0][0]-1)/2), int((grid_points[0][1]-1)/2) ], [int((grid_points[1][0]-1)/2), int((grid_points[1][1]-1)/2) ]]
-                all_invalid_adj_blocks.extend(converted_to_blocks)
-
-        # conditions to place a block in a board position:
-        # 1. board position must be valid
-        # 2. if block is OPAQUE or REFLECT, board position must not be adjacent to target
-
-
-        for i in range(len(game1.available_blocks)):
-            next_block = game1.available_blocks[i]
-            is_placed = False
-
-            while is_placed == False:
-                next_rand = [[rand_x, rand_y]]
-
-                if game1.board[rand_y][rand_x] is not VALID:
-                    rand_x = random.randint(0, len(game1.board[0])-1)
-                    rand_y = random.randint(0, len(game1.board)-1)
-                    is_placed = False
-
-                elif game1.board[rand_y][rand_x] is VALID:
-                    if next_block.block_type == OPAQUE or next_block.block_type == REFLECT:
-                        if any(elem in all_invalid_adj_blocks for elem in next_rand) == True:
-                            rand_x = random.randint(0, len(game1.board[0])-1)
-                            rand_y = random.randint(0, len(game1.board)-1)
-                            is_placed = False
-
-                        else:
-                            game1.put_block(next_block, rand_x, rand_y)
-                            is_placed = True
+    **Returns**
+        placement: *list of tuples*
+            the first placement that solves the board (None if none does, or if the search was stopped)
+        iterations: *int*
+            number of placements checked
+    '''
+    profile = stats is not None and stats.profile
+    iterations = 0
+    for placement in placements:
+        iterations += 1
+        if stop is not None and iterations % STOP_CHECK_INTERVAL == 0 and stop.is_set():
+            return None, iterations
 
-                    else:
-                        game1.put_block(next_block, rand_x, rand_y)
-                        is_placed = True
+        if profile:
+            stats.lap()
+        table.set_placement(placement)
+        if profile:
+            stats.lap("put_blocks")
 
+        solved = table.hit_all_targets()
+        if profile:
+            stats.lap("hit_all_targets")
+        if solved:
+            return placement, iterations
 
-        # create grids from the blocks you put
-        game1.create_grid()
+    return None, iterations
+
+
+# parts of the placements per worker process of solve_parallel(): many small parts keep all the workers busy until the end
+PARTS_PER_PROCESS = 16
 
-        if(len(board_List) != 0):
-            if game1.board in board_List:
-                pass
+# stop event shared by the workers of solve_parallel(), the board compiled once per worker and whether the stages are timed (see _init_worker())
+_STOP = None
+_WORKER_BOARD = None
+_WORKER_PROFILE = False
 
-        #         for i in range(len(board_List)):
-        #             if(game1.board == board_List[i]):
-        #                 game1.create_board()
-        #                 game1.create_grid()
-        #                 rand_x = random.randint(0, len(game1.board[0]) - 1)
-        #                 rand_y = random.randint(0, len(game1.board) - 1)
 
-        print('board')
-        for i in range(len(game1.board)):
-            print(game1.board[i])
+def _init_worker(stop, puzzle, analysis, profile=False):
+    '''
+    Initializer of the workers of solve_parallel(): compiles the board of the puzzle once, for all the parts the worker checks.
+    '''
+    global _STOP, _WORKER_BOARD, _WORKER_PROFILE
+    _STOP = stop
+    _WORKER_PROFILE = profile
+    game0 = Game.from_puzzle(puzzle)
+    game0.create_board()
+    game0.create_grid()
+    positions, restricted = analysis[:2]
+    _WORKER_BOARD = (TransitionTable(game0), positions, restricted)
+
+
+def _solve_prefix(prefix):
+    '''
+    Worker of solve_parallel(): checks every placement that starts with the given prefix (see placement_prefixes()). Returns the solution found (None if none), the number of placements and steps checked, and the stats of the part if it was profiled (None otherwise).
+    '''
+    if _STOP.is_set():
+        return None, 0, 0, None
+    table, positions, restricted = _WORKER_BOARD
+    game0 = table.game
+    steps = table.steps
+    stats = SolveStats(profile=True) if _WORKER_PROFILE else None
+    placements = iter_placements(positions, game0.n_refract, game0.n_reflect, game0.n_opaque, restricted, prefix)
+    placement, iterations = first_solution(table, placements, _STOP, stats)
+    if placement is not None:
+        # tell the other workers to give up
+        _STOP.set()
+    return placement, iterations, table.steps - steps, stats
+
+
+def solve_parallel(puzzle, processes=None, stats=None, analysis=None, render=True):
+    '''
+    Parallel version of solve_exhaustive(). The placements are split by their first blocks into PARTS_PER_PROCESS parts per worker (see placement_prefixes()), and the parts are handed out, largest first, to the workers of a multiprocessing pool. The workers share a stop event, so all of them give up as soon as one of them finds a solution.
+
+    **Parameters**
 
-        for i in range(len(game1.available_lasers)):
-            game1.shoot(game1.available_lasers[i])
+        puzzle: *Puzzle*
+            the puzzle to solve (see read_puzzle())
+        processes: *int, optional*
+            number of worker processes (the number of CPUs by default)
+        analysis: *BoardAnalysis, optional*
+            analysis of the board, if it is already known (see analyze_board())
 
+        render: *bool, optional*
+            save an image of the solution in the working directory (see save_board()). Processes that only need the board turn it off, so they never load the image libraries
+    **Returns**
+        solved: *bool*
+            True if game was solved, False if no placement solves it
+        board: *list*
+            Board representation of the solution (the empty board if it was not solved)
+    '''
+    game0 = Game.from_puzzle(puzzle)
+    game0.create_board()
+    game0.create_grid()
 
-        # while loop: while there are lasers that have not been shot do a for loop to shoot all lasers
+    analysis = analysis or analyze_board(game0)
+    positions, restricted = analysis[:2]
+    total = count_placements(positions, game0.n_refract, game0.n_reflect, game0.n_opaque, restricted)
+    processes = processes or os.cpu_count() or 1
+    prefixes = placement_prefixes(positions, game0.n_refract, game0.n_reflect, game0.n_opaque, restricted, PARTS_PER_PROCESS*processes)
+    LOG_SOLVE.info('checking %i possible placements in %i parts', total, len(prefixes))
 
-        # all_shot = False
-        # for i in range(len(game1.available_lasers)):
-        #     if not game1.available_lasers[i].was_shot:
-        #         game1.shoot(game1.available_lasers[i])
-        #     else: 
-        #         print('you shot all your shots')
-        #         all_shot = True
+    stop = multiprocessing.Event()
 
-        all_shot = False
- 
-        for i in range(len(game1.available_lasers)):
-            if not game1.available_lasers[i].was_shot:
-                game1.shoot(game1.available_lasers[i])
+    iterations = 0
+    steps = 0
+    solution = None
+    profile = stats is not None and stats.profile
+    with multiprocessing.Pool(processes, initializer=_init_worker, initargs=(stop, puzzle, analysis, profile)) as pool:
+        for placement, n, n_steps, part_stats in pool.imap_unordered(_solve_prefix, prefixes):
+            iterations += n
+            steps += n_steps
+            if part_stats is not None:
+                stats.merge(part_stats)
+            if placement is not None:
+                solution = placement
+                stop.set()
+                break
+
+    if stats is not None:
+        stats.iterations += iterations
+        stats.steps += steps
+
+    if solution is not None:
+        game1 = shoot_placement(puzzle, solution)
+        if render:
+            save_board(game1.board, blockSize=100)
+        log_solution(game1.board, iterations)
+        return True, game1.board
 
-            # print(game1.available_lasers[i].get_trajectory())
+    LOG_SOLVE.info('none of the %i possible placements solves the board', total)
+    return False, game0.board
+
+
+def solve_backtrack(puzzle, max_visited=None, stats=None, analysis=None, stop=None, render=True):
+    '''
+    Backtracking version of solve_game(). Blocks are put one at a time. After each block is put the laser beams on the partially filled board are updated (see BeamTrace), and the next block is only tried in the positions that the current laser beams pass through (a block anywhere else would not change the beams). Once all the targets are hit, the blocks left are put in positions that no beam touches.
+
+    Any solution can be built this way: putting its blocks in the order in which the beams reach them, every block is touched by the beams of the blocks put before it.
+
+    **Parameters**
+
+        puzzle: *Puzzle*
+            the puzzle to solve (see read_puzzle())
+        max_visited: *int, optional*
+            max number of boards remembered to avoid checking the same board twice (see VisitedLayouts)
+        analysis: *BoardAnalysis, optional*
+            analysis of the board, if it is already known (see analyze_board())
+        stop: *multiprocessing.Event, optional*
+            if given, the search gives up as soon as the event is set (it is checked every STOP_CHECK_INTERVAL boards)
+
+        render: *bool, optional*
+            save an image of the solution in the working directory (see save_board()). Processes that only need the board turn it off, so they never load the image libraries
+    **Returns**
+        solved: *bool*
+            True if game was solved, False if no placement solves it
+        board: *list*
+            Board representation of the solution (the empty board if it was not solved)
+    '''
+    game0 = Game.from_puzzle(puzzle)
+    game0.create_board()
+    game0.create_grid()
+    analysis = analysis or analyze_board(game0)
+    restricted = set(tuple(p) for p in analysis.restricted)
+
+    # the beams are updated every time a block is put or removed
+    trace = BeamTrace(game0)
+
+    def park(game, left):
+        # put the blocks left in valid positions that no laser beam touches, or that no beam can ever head into (a beam can touch a face of a block without going into it)
+        touched = trace.blocks_touched()
+        free = [(x, y) for y in range(game.b_height) for x in range(game.b_width)
+                if game.board[y][x] == VALID and ((x, y) not in touched or (x, y) not in analysis.reachable)]
+        parked = []
+        for block_type in (REFLECT, OPAQUE, REFRACT):
+            for i in range(left[block_type]):
+                options = [p for p in free if block_type == REFRACT or p not in restricted]
+                if len(options) == 0:
+                    return None
+                free.remove(options[0])
+                parked.append((options[0][0], options[0][1], block_type))
+        return parked
+
+    left = {REFRACT: game0.n_refract, REFLECT: game0.n_reflect, OPAQUE: game0.n_opaque}
+    visited = VisitedLayouts(max_visited)
+    iterations = [0]
+    stopped = [False]
+    profile = stats is not None and stats.profile
+
+    def search(placement, key):
+        if stopped[0]:
+            return None
+        iterations[0] += 1
+        if stop is not None and iterations[0] % STOP_CHECK_INTERVAL == 0 and stop.is_set():
+            stopped[0] = True
+            return None
+
+        if profile:
+            stats.lap()
+        hit_all = trace.hit_all_targets()
+        if profile:
+            stats.lap("hit_all_targets")
+        if hit_all:
+            parked = park(game0, left)
+            if parked is not None:
+                return placement + parked
+
+        touched = sorted(trace.blocks_touched())
+        for block_type in (REFRACT, REFLECT, OPAQUE):
+            if left[block_type] == 0:
+                continue
+            for x, y in touched:
+                if game0.board[y][x] != VALID or (x, y) not in analysis.reachable:
+                    continue
+                if block_type != REFRACT and (x, y) in restricted:
+                    continue
+                # the block goes in an empty position, so its value is just added to the key
+                next_key = key + (block_type << (LAYOUT_BITS * (y*game0.b_width + x)))
+                if not visited.add(next_key):
+                    continue
+
+                left[block_type] -= 1
+                if profile:
+                    stats.lap()
+                trace.set_block(x, y, block_type)
+                if profile:
+                    stats.lap("put_blocks")
+                solution = search(placement + [(x, y, block_type)], next_key)
+                if profile:
+                    stats.lap()
+                trace.set_block(x, y, VALID)
+                if profile:
+                    stats.lap("put_blocks")
+                left[block_type] += 1
+                if solution is not None:
+                    return solution
+        return None
+
+    solution = search([], layout_key(game0.board))
+    if stats is not None:
+        stats.iterations += iterations[0]
+        stats.steps += trace.steps
+    if solution is None and stopped[0]:
+        LOG_SOLVE.info('search stopped after %i boards', iterations[0])
+        return False, game0.board
+    if solution is None:
+        LOG_SOLVE.info('no placement of the blocks solves the board (%i boards checked)', iterations[0])
+        return False, game0.board
+
+    game1 = shoot_placement(puzzle, solution)
+    if render:
+        save_board(game1.board, blockSize=100)
+    log_solution(game1.board, iterations[0])
+    return True, game1.board
+
+
+def solve_game(filename, mode="random", max_visited=None, trace_iterations=(), processes=None, stats=None, cache=None, time_budget=None, render=True):
+    '''
+    Function that solves the game. This function takes a game as an input (this game object already has all the blocks available placed in a specific arrangement) and turns on all the lasers (shoot()). It will then calculate/obtain all the path trajectories from each laser and compare the points in the trajectories to the points that we are targetting. If all the target points are included in the trajectories then the game is solved and the function returns an image representation (or text to simplify) showing which block arrangement solves the puzzle. If any of the target points is missing in the trajectories then the puzzle is not solved, the function will regenerate the game() object and check to see if this new arrangement solves the board.
+
+    **Parameters**
+
+        filename: *str*
+            filename plus extension of the file you want to read the game information from.
+        mode: *str, optional*
+            "random" (default) draws random positions for the blocks until the board is solved or the max iterations are reached.
+            "exhaustive" walks every distinct placement of the blocks exactly once (see iter_placements()), so if it returns False the board has no solution.
+            "backtrack" puts the blocks one at a time, only where the laser beams pass through (see solve_backtrack()).
+            "parallel" splits the placements of the exhaustive mode over several processes (see solve_parallel()).
+            "anytime" checks the placements of the exhaustive mode until the time budget runs out, and returns the board hitting the most targets if it was not solved (see solve_anytime()).
+        max_visited: *int, optional*
+            max number of checked boards remembered to skip repeated boards (see VisitedLayouts). All of them are remembered by default.
+        trace_iterations: *list of ints or True, optional*
+            iterations of the random mode whose lasers are traced step by step by the "lazor.shoot" logger (True for all of them). The logger must be set to the DEBUG level (see set_log_level()).
+        processes: *int, optional*
+            number of worker processes of the parallel mode (the number of CPUs by default)
+        stats: *SolveStats, optional*
+            if given, it is filled in with the counters of the solve (see SolveStats)
+        cache: *SolutionCache, optional*
+            if given, the solution is looked up in the cache before solving the board, and saved in it after solving it
+        time_budget: *float, optional*
+            wall-clock seconds the anytime mode can take (no limit by default)
+        render: *bool, optional*
+            save an image of the solution in the working directory (see save_board()), on by default
+
+    **Returns**
+        solved: *bool*
+            True if game was solved, False if it was not
+        board: *list*
+            Board representation of the solution
+
+
+    '''
+    return solve_puzzle(read_puzzle(filename), mode, max_visited, trace_iterations, processes, stats, cache, time_budget, render=render)
+
+
+def solve_puzzle(puzzle, mode="random", max_visited=None, trace_iterations=(), processes=None, stats=None, cache=None, time_budget=None, analysis=None, stop=None, render=True):
+    '''
+    Solves a Puzzle that was already read (see read_puzzle() and PuzzleCorpus). The parameters and the result are the ones of solve_game(), analysis is the BoardAnalysis of the puzzle, if it is already known (e.g. saved in a PuzzleCorpus, see analyze_board()), and stop is an event (anything with an is_set() method) that makes the search give up when it is set, e.g. when its caller stopped waiting for it. The parallel mode has its own stop event and ignores it. With render=False no solution image is saved (workers that return the board do not need it).
+    '''
+    if stats is not None:
+        stats.mode = mode
+
+    if cache is not None:
+        key = puzzle_key(*puzzle.as_args())
+        cached = cache.get(key)
+        if cached is not None:
+            LOG_SOLVE.info('solution found in the cache')
+            if stats is not None:
+                stats.solved = True
+                stats.cached = True
+            return True, cached[0]
+
+    if mode == "exhaustive":
+        result = solve_exhaustive(puzzle, stats, analysis, stop, render=render)
+    elif mode == "backtrack":
+        result = solve_backtrack(puzzle, max_visited, stats, analysis, stop, render=render)
+    elif mode == "parallel":
+        result = solve_parallel(puzzle, processes, stats, analysis, render=render)
+    elif mode == "random":
+        result = solve_random(puzzle, max_visited, trace_iterations, stats, analysis, stop, render=render)
+    elif mode == "anytime":
+        result = solve_anytime(puzzle, time_budget, stats, analysis, stop, render=render)
+    else:
+        raise ValueError("Unknown solve mode: %s" % mode)
+
+    if stats is not None:
+        stats.solved = result[0]
+    if cache is not None and result[0]:
+        cache.put(key, result[1], stats)
+    return result
+
+
+def solve_random(puzzle, max_visited=None, trace_iterations=(), stats=None, analysis=None, stop=None, render=True):
+    '''
+    Random version of solve_game() (its default mode): draws random positions for the blocks until the board is solved, every possible board was checked or the max iterations are reached.
+
+    **Parameters**
+
+        puzzle: *Puzzle*
+            the puzzle to solve (see read_puzzle())
+        max_visited, trace_iterations:
+            see solve_game()
+        stats: *SolveStats, optional*
+            if given, it is filled in with the number of iterations and steps of the beams traced
+        analysis: *BoardAnalysis, optional*
+            analysis of the board, if it is already known (see analyze_board())
+        stop: *multiprocessing.Event, optional*
+            if given, the search gives up as soon as the event is set (it is checked every STOP_CHECK_INTERVAL boards)
+
+        render: *bool, optional*
+            save an image of the solution in the working directory (see save_board()). Processes that only need the board turn it off, so they never load the image libraries
+    **Returns**
+        solved: *bool*
+            True if game was solved, False if it was not
+        board: *list*
+            Board representation of the solution
+    '''
+    
+    solved = False
+    iterations = 0
+    MAX_ITERATIONS = 10000000
+
+    # boards that were already checked, so that a repeated board is skipped before shooting the lasers
+    visited = VisitedLayouts(max_visited)
+    game0 = Game.from_puzzle(puzzle)
+    game0.create_board()
+    game0.create_grid()
+    positions, restricted = (analysis or analyze_board(game0))[:2]
+    total = count_placements(positions, game0.n_refract, game0.n_reflect, game0.n_opaque, restricted)
+    if total == 0:
+        LOG_SOLVE.info('there is no placement of the blocks to check')
+        return False, game0.board
+    game1 = game0
+    profile = stats is not None and stats.profile
+    if profile:
+        game1.stats = stats
+
+    draws = 0
+    while solved == False and iterations <= MAX_ITERATIONS:
+        draws += 1
+        if stop is not None and draws % STOP_CHECK_INTERVAL == 0 and stop.is_set():
+            LOG_SOLVE.info('search stopped after %i iterations', iterations)
+            break
+        # the same game (and grid buffer) is used for every arrangement of the blocks
+        if profile:
+            stats.lap()
+        game1.reset()
+        if profile:
+            stats.lap("create_board")
+
+        # put the blocks available at random positions. Blocks of the same type are interchangeable, so the positions of each type are drawn as a combination (see random_placement()), and every arrangement of the blocks is drawn in one canonical order.
+        # if a target is on the edge of the board, then the block adjacent to the target becomes invalid for reflect and opaque blocks. If the target is not on the edge of the board, then the invalid block is the one adjacent to it from the side that the laser beam is coming.
+        placement = random_placement(positions, game1.n_refract, game1.n_reflect, game1.n_opaque, restricted)
+
+        # the available blocks are in the same order as the placement: REFRACT, REFLECT and then OPAQUE
+        for block, (x, y, block_type) in zip(game1.available_blocks, placement):
+            game1.put_block(block, x, y)
+        if profile:
+            stats.lap("put_blocks")
+
+        if not visited.add(layout_key(game1.board)):
+            # if every possible board was checked (and none was forgotten) there is nothing left to try
+            if len(visited) >= total and visited.evicted == 0:
+                LOG_SOLVE.info('all the %i possible placements were checked and none solves the board', total)
+                break
+            continue
+
+        # create grids from the blocks you put
+        if profile:
+            stats.lap()
+        game1.create_grid()
+        if profile:
+            stats.lap("create_grid")
+
+        if trace_iterations is True or iterations in trace_iterations:
+            game1.trace = True
+        if LOG_SOLVE.isEnabledFor(logging.DEBUG):
+            LOG_SOLVE.debug('iteration %i, board: %s', iterations, game1.board)
+
+        # the trajectories are not needed once all the targets are hit
+        if profile:
+            stats.lap()
+        game1.stop_when_solved = True
+        game1.shoot_all()
+        if profile:
+            stats.lap("shoot")
 
 
         # once all lasers have been shot, re-check that and then check to see if the targets have been hit.
@@ -327,32 +1614,139 @@ def solve_game(filename):
         # if all the targets have been hit then success you win, return self.board w the winning blocks position. Else: you lost, re-generate another game with a different position for the blocks (assuming it is random)
 
 
-        if game1.hit_all_targets() == True:
+        hit_all = game1.hit_all_targets()
+        if profile:
+            stats.lap("hit_all_targets")
+
+        if hit_all == True:
             solved = True
             # print(iterations)
             max_iters = iterations + 1
-            save_board(game1.board, blockSize=100)
-            print("you solved it in %i iterations!" %max_iters)
-            print('the winning board is:')
-            for i in range(len(game1.board)):
-                print(game1.board[i])
+            if render:
+                save_board(game1.board, blockSize=100)
+            log_solution(game1.board, max_iters)
 
         else:
-            board_List.append(game1.board)
             solve = False
             iterations += 1
-            print("NEW BOARD")
 
         if iterations >= MAX_ITERATIONS:
-            print("loser")
-            print('the board could not be solved under the max specified iterations. Try running it again or increase the max allowed iterations per run')
+            LOG_SOLVE.info('the board could not be solved under the max specified iterations. Try running it again or increase the max allowed iterations per run')
             # print(iterations)
             solved = False
             
-
+    if stats is not None:
+        stats.iterations += iterations + 1 if solved else iterations
+        stats.steps += game1.steps
     return solved, game1.board
 
 
+# result of solving one file of a batch (see solve_batch()). status is "solved", "no solution" or "error", board is None unless solved (for the anytime mode, it is the best board found) and stats is the SolveStats() of the solve
+BatchResult = collections.namedtuple("BatchResult", ["filename", "status", "board", "seconds", "error", "stats"])
+
+
+def find_levels(paths):
+    '''
+    Returns the sorted list of .bff files given by a list of file names, glob patterns and directories (all the .bff files in a directory are taken).
+    '''
+    filenames = set()
+    for path in paths:
+        if os.path.isdir(path):
+            filenames.update(glob.glob(os.path.join(path, "*.bff")))
+        elif glob.has_magic(path):
+            filenames.update(glob.glob(path))
+        else:
+            filenames.add(path)
+    return sorted(filenames)
+
+
+# corpus files opened by a worker of solve_batch(), kept open for the next puzzles of the same corpus
+_CORPORA = {}
+
+
+def _solve_file(args):
+    '''
+    Worker of solve_batch(): solves one file, or one puzzle of a corpus given as (corpus file, index), and never raises, the error is reported in the result instead. The image of a solution is named after its level, as the workers share the working directory.
+    '''
+    filename, mode, profile, cache_file, time_budget, render = args
+    stats = SolveStats(profile)
+    start = time.perf_counter()
+    cache = None
+    try:
+        if cache_file is not None:
+            cache = SolutionCache(cache_file)
+        if isinstance(filename, tuple):
+            corpus_file, index = filename
+            if corpus_file not in _CORPORA:
+                _CORPORA[corpus_file] = PuzzleCorpus(corpus_file)
+            corpus = _CORPORA[corpus_file]
+            level = corpus.name(index)
+            filename = "%s:%s" % (corpus_file, level)
+            puzzle = corpus[index]
+            # the face map and the analysis saved in the corpus are used instead of computing them again
+            faces = corpus.face_map(index)
+            if faces is not None:
+                share_face_map(2*len(puzzle.board[0]) + 1, 2*len(puzzle.board) + 1, faces)
+            analysis = corpus.analysis(index)
+        else:
+            level = os.path.splitext(os.path.basename(filename))[0]
+            puzzle = read_puzzle(filename)
+            analysis = None
+        solved, board = solve_puzzle(puzzle, mode, stats=stats, cache=cache, time_budget=time_budget, analysis=analysis, render=False)
+        if render and solved:
+            save_board(board, blockSize=100, basename="lazor_solution_" + level)
+    except Exception as error:
+        return BatchResult(filename, "error", None, time.perf_counter() - start, "%s: %s" % (type(error).__name__, error), stats)
+    finally:
+        if cache is not None:
+            cache.close()
+    status = "solved" if solved else "no solution"
+    return BatchResult(filename, status, board if solved or mode == "anytime" else None, time.perf_counter() - start, None, stats)
+
+
+def solve_batch(paths, mode="backtrack", processes=None, profile=False, cache_file=None, time_budget=None, render=False):
+    '''
+    Generator that solves many .bff files concurrently in a multiprocessing pool. Every file is read once, by the worker that solves it, and the results are yielded as soon as they are ready (not in the order of the files). Corpus files (.lzc, see compile_puzzles()) are opened once per worker, and all their puzzles are solved.
+
+    **Parameters**
+
+        paths: *list of str*
+            .bff or .lzc files, glob patterns (e.g. "levels/mad_*.bff") or directories
+        mode: *str, optional*
+            solve mode used for every file (see solve_game()). The parallel mode can not be used, as the files are already solved in parallel.
+        processes: *int, optional*
+            number of worker processes (the number of CPUs by default)
+        profile: *bool, optional*
+            time the stages of the solves (see SolveStats)
+        cache_file: *str, optional*
+            sqlite file of a SolutionCache shared by all the workers
+        time_budget: *float, optional*
+            wall-clock seconds the anytime mode can take for every file
+        render: *bool, optional*
+            save an image of every solution in the working directory, named after its level (e.g. lazor_solution_mad_1_4_4_100.png). Off by default, so the workers do not load the image libraries
+
+    **Yields**
+
+        result: *BatchResult*
+            filename (corpus file:name for the puzzles of a corpus), status ("solved", "no solution" or "error"), winning board, time spent, error message and stats of every file
+    '''
+    if mode == "parallel":
+        raise ValueError("The parallel mode can not be used to solve a batch of files")
+
+    sources = []
+    for filename in find_levels(paths):
+        if filename.endswith(".lzc"):
+            with PuzzleCorpus(filename) as corpus:
+                sources.extend((filename, index) for index in range(len(corpus)))
+        else:
+            sources.append(filename)
+    if not sources:
+        return
+    with multiprocessing.Pool(min(processes or os.cpu_count() or 1, len(sources))) as pool:
+        for result in pool.imap_unordered(_solve_file, [(source, mode, profile, cache_file, time_budget, render) for source in sources]):
+            yield result
+
+
 class Game():
     '''
     Game class contains the read in board, and generates Laser() and Block() instances accordingly, based on the read-in file.
@@ -377,17 +1771,14 @@ class Game():
         w_blocks = len(board_list_of_str[0])
         h_blocks = len(board_list_of_str)
 
-        for i in range(len(num_blocks)): 
-            if num_blocks[i] == '':
-                num_blocks[i] = '0'
-
         self.b_width = w_blocks
         self.b_height = h_blocks
         self.g_width = w_blocks*2+1
         self.g_height = h_blocks*2+1
-        self.n_reflect = int(num_blocks[0])
-        self.n_opaque = int(num_blocks[1])
-        self.n_refract = int(num_blocks[2])
+        # missing block counts can be given as '' (or 0)
+        self.n_reflect = int(num_blocks[0] or 0)
+        self.n_opaque = int(num_blocks[1] or 0)
+        self.n_refract = int(num_blocks[2] or 0)
         self.board_str = board_list_of_str
         self.lasers_pos = lasers_pos
         self.lasers_dir = lasers_dir
@@ -395,6 +1786,21 @@ class Game():
         self.board = []
         self.grid = []
         self.grid_faces = []
+        # both grids live in a single flat buffer (see create_grid()): the grid layer first, then the faces layer
+        self.cells = None
+        self.layer_size = self.g_width*self.g_height
+        self.trace = False # log the trajectories of all the lasers step by step (see shoot())
+        self.visited_states = set() # (x, y, xdir, ydir) states the lasers shot so far went through
+        self.stop_when_solved = False # stop shooting as soon as all the targets are hit (the trajectories are left incomplete)
+        self.stats = None # SolveStats() that counts the steps, reflections, refractions and absorptions of shoot() (only when profiling)
+        self.steps = 0 # steps of all the lasers shot by this game, through every board it checked (see SolveStats)
+
+        # targets and the targets hit so far as bitmasks, with bit y*g_width + x for the grid point x, y
+        self.target_mask = 0
+        for x, y in targets:
+            self.target_mask |= 1 << (y*self.g_width + x)
+        self.lit_targets = 0
+        self.queued_states = set() # starting states of the refracted lasers added to available_lasers
 
 
         # Create blocks and lasers available for the game, based on file info
@@ -418,6 +1824,27 @@ class Game():
             self.available_lasers.append(laser)
 
 
+    @classmethod
+    def from_puzzle(cls, puzzle):
+        '''
+        Creates a Game() instance from a Puzzle (see read_puzzle()). The board and the lists of lasers and targets are only read by the game, so the tuples of the puzzle are used as they are.
+        '''
+        lasers = puzzle.lasers
+        return cls(puzzle.board, (puzzle.n_reflect, puzzle.n_opaque, puzzle.n_refract),
+                   [laser[:2] for laser in lasers], [laser[2:] for laser in lasers], puzzle.targets)
+
+
+    def reset(self):
+        '''
+        Takes the game back to the board read from the file, with no blocks put and no lasers shot, so that the same Game() instance can be used to check another arrangement of the blocks. The grid buffer is kept and filled in again by the next create_grid().
+        '''
+        self.create_board()
+        self.available_lasers = [Laser(pos[0], pos[1], direction[0], direction[1]) for pos, direction in zip(self.lasers_pos, self.lasers_dir)]
+        self.trace = False
+        self.visited_states.clear()
+        self.queued_states.clear()
+        self.lit_targets = 0
+
 
     def create_board(self):
         '''
@@ -444,33 +1871,33 @@ class Game():
 
     def create_grid(self):
         '''
-        First initializes a grid of the necessary dimensions and duplicates it. The function then populates the first grid to match with the corresponding blocks from the self.board variable generated before.
-        The function populates the duplicate grid with the values corresponding to the vertical (2) or horizontal (1) faces of each cube. This will determine laser behaviour when it encounters the blocks.
-        Stores the generated grids as a self variables of the Game() instance.
+        Fills in the grid to match with the corresponding blocks from the self.board variable generated before, and the faces grid with the values corresponding to the vertical (2) or horizontal (1) faces of each cube. This will determine laser behaviour when it encounters the blocks.
+
+        Both grids are stored in one flat buffer, self.cells: the value of the grid point x, y is self.cells[y*g_width + x] and its face self.cells[layer_size + y*g_width + x]. The buffer is allocated the first time and then reused, so creating the grid again after putting other blocks just writes the blocks in place. self.grid and self.grid_faces are lists with a view of every row of the buffer, and can be indexed as grid[y][x].
         '''
-        grid = [[VALID for _ in range(self.g_width)] for _ in range(self.g_height)]
-        grid_faces = copy.deepcopy(grid)
+        width = self.g_width
+        size = self.layer_size
+
+        if self.cells is None:
+            self.cells = bytearray(2*size)
+            view = memoryview(self.cells)
+            self.grid = [view[y*width:(y+1)*width] for y in range(self.g_height)]
+            self.grid_faces = [view[size + y*width:size + (y+1)*width] for y in range(self.g_height)]
+            # the faces only depend on the size of the grid, and never change
+            self.cells[size:] = face_map(width, self.g_height)
+        else:
+            self.cells[:size] = bytes(size)
 
-        for w in range(self.b_width):
-            for h in range(self.b_height):
-                if self.board[h][w] == VALID:
-                    uselessgrid, grid_faces = self.cardinal(grid, grid_faces, 2*w+1, 2*h+1, VALID)
-                    continue
-                if self.board[h][w] == INVALID:
-                    grid[2*h+1][2*w+1] = INVALID
-                    grid, grid_faces = self.cardinal(grid, grid_faces, 2*w+1, 2*h+1, INVALID)
-                if self.board[h][w] == REFLECT: 
-                    grid[2*h+1][2*w+1] = REFLECT
-                    grid, grid_faces = self.cardinal(grid, grid_faces, 2*w+1, 2*h+1, REFLECT)
-                if self.board[h][w] == OPAQUE:
-                    grid[2*h+1][2*w+1] = OPAQUE
-                    grid, grid_faces = self.cardinal(grid, grid_faces, 2*w+1, 2*h+1, OPAQUE)
-                if self.board[h][w] == REFRACT: 
-                    grid[2*h+1][2*w+1] = REFRACT
-                    grid, grid_faces = self.cardinal(grid, grid_faces, 2*w+1, 2*h+1, REFRACT)
-
-        self.grid =  grid
-        self.grid_faces = grid_faces
+        # every block gives its value to its center and to the faces where it is larger than the block on the other side (see cardinal())
+        cells = self.cells
+        for h, row in enumerate(self.board):
+            for w, value in enumerate(row):
+                if value != VALID:
+                    center = (2*h+1)*width + 2*w+1
+                    cells[center] = value
+                    for face in (center - width, center + width, center - 1, center + 1):
+                        if cells[face] < value:
+                            cells[face] = value
 
 
     def cardinal(self, grid, grid_faces, x, y, value):
@@ -545,6 +1972,41 @@ class Game():
         return self.board
         
 
+    def set_block(self, x, y, value):
+        '''
+        Changes the block in the x and y position of the board, and updates the grid in place: the center of the block and its four faces. A face takes the largest value of the two blocks it is shared by (see cardinal()).
+
+        **Parameters**
+
+            x: *int*
+                x position of the board block (not of the grids)
+            y: *int*
+                y position of the board block (not of the grids)
+            value: *int or codeword*
+                REFLECT, OPAQUE, REFRACT or VALID (to remove a block)
+
+        **Returns**
+
+            faces: *list of tuples*
+                (x, y) grid positions of the faces of the block
+        '''
+        self.board[y][x] = value
+        width = self.g_width
+        cells = self.cells
+        gx = 2*x + 1
+        gy = 2*y + 1
+        cells[gy*width + gx] = value
+        faces = [(gx, gy-1), (gx, gy+1), (gx-1, gy), (gx+1, gy)]
+        for fx, fy in faces:
+            # center of the block on the other side of the face
+            cx = 2*fx - gx
+            cy = 2*fy - gy
+            if 0 <= cx < width and 0 <= cy < self.g_height:
+                cells[fy*width + fx] = max(value, cells[cy*width + cx])
+            else:
+                cells[fy*width + fx] = value
+        return faces
+
     def within_bounds(self, matrix, x, y):
         '''
         Function that checks if a given x and y coordinate is within the bounds of a given matrix type object or not. Returns True/False. 
@@ -572,197 +2034,539 @@ class Game():
             return False
         return True
 
+    def facing_block(self, x, y, xdir, ydir):
+        '''
+        Returns the value in the grid of the center of the block that a laser in the x and y position, going in the xdir and ydir direction, is about to go through. Returns None if that block is outside of the grid.
+        '''
+        face = self.cells[self.layer_size + y*self.g_width + x]
+        if face == 2:
+            x = x + xdir
+        elif face == 1:
+            y = y + ydir
+        else:
+            return None
+        if x < 0 or x >= self.g_width or y < 0 or y >= self.g_height:
+            return None
+        return self.cells[y*self.g_width + x]
+
     def get_block_face(self, x, y):  
         '''
         Returns the value of the block face at a given x and y coordinates(1 or 2 for horizontal or vertical faces respectively)
         '''      
-        return self.grid_faces[y][x]
+        return self.cells[self.layer_size + y*self.g_width + x]
 
     def hit_all_targets(self):
         '''
-        This function checks if all the target points are covered in the lasers' trajectories. It pools all trajectories from the different available lasers and compares the list of target points to this list of trajectories. If all targets are within the trajectory list the function returns True. If one or more points are missing in the trajectories returns False. 
+        This function checks if all the target points are covered in the lasers' trajectories. The targets are marked in the self.lit_targets bitmask as the lasers are shot, so this is a single comparison against the self.target_mask bitmask. If all targets were hit the function returns True. If one or more points are missing in the trajectories returns False. 
         '''
-
-        total_trajectories = []
-
-        for i in range(len(self.available_lasers)):
-            traj = list(self.available_lasers[i].get_trajectory())
-            total_trajectories.extend(traj)
-
-        result = all(elem in total_trajectories for elem in self.targets)
-        return result
+        return self.lit_targets & self.target_mask == self.target_mask
         
 
-    def shoot(self, laser):
+    def shoot_all(self):
         '''
-        This funciton shoots a given laser, i.e. calculates all the points in the trajectory after the blocks have been placed. It does so stepwise and appends each step to the self.path variable in the laser.
+        Shoots every available laser, including the lasers created by refractive blocks while shooting, until all of them have been shot.
         '''
-        print('we\'re shooting laser: ' + str(laser.x) + ', ' + str(laser.y))
-        print('so far it\'s trajectory is: ' + str(laser.path))
+        i = 0
+        while i < len(self.available_lasers):
+            if self.stop_when_solved and self.lit_targets == self.target_mask:
+                break
+            if not self.available_lasers[i].was_shot:
+                self.shoot(self.available_lasers[i])
+            i += 1
 
-        # print('grid faces:')
-        # for i in range(len(self.grid_faces)):
-        #     print(self.grid_faces[i])
+    def shoot(self, laser):
+        '''
+        This funciton shoots a given laser, i.e. calculates all the points in the trajectory after the blocks have been placed. It does so stepwise and appends each step, packed (see Laser.pack()), to the path of the laser.
 
-        current_x, current_y = laser.get_position()
-        xdir, ydir = laser.get_direction()
+        Every step is logged by the "lazor.shoot" logger (DEBUG level) if tracing is turned on for the game or for the laser (see Game.trace and Laser.trace). Otherwise nothing is formatted at all.
+        '''
+        trace = (self.trace or laser.trace) and LOG_SHOOT.isEnabledFor(logging.DEBUG)
+        if trace:
+            LOG_SHOOT.debug('shooting laser %i, %i with direction %i, %i. Trajectory so far: %s', laser.x, laser.y, laser.xdir, laser.ydir, laser.get_trajectory())
+
+        path = laser.path
+        absorbed = Laser.ABSORBED
+        # start from the last point in the path: for refracted lasers the path already includes the step through the refractive block
+        current_x, current_y = Laser.unpack(path[-1])
+        # states (point and direction) the laser goes through, as TransitionTable and BeamTrace count them
+        steps = 0
+
+        # a block adjacent to the laser origin is handled in the first step of the while loop, like any other point of the trajectory
+        next_x = current_x + laser.xdir
+        next_y = current_y + laser.ydir
 
-        # check to see if any block is adjacent to the laser origin
-        if self.grid[current_y][current_x] == REFLECT:
-            print('reflective adj')
-            if (self.grid_faces[current_y][current_x] == 2 and self.grid[current_y][current_x+xdir] == REFLECT) or (self.grid_faces[current_y][current_x] == 1 and self.grid[current_y+ydir][current_x] == REFLECT):
+        while self.within_bounds(self.grid, next_x, next_y) and path[-1] != absorbed:
+            # if a laser already went through this point in this direction (another laser, or this one going in a loop), the rest of the trajectory is already known
+            state = (current_x, current_y, laser.xdir, laser.ydir)
+            if state in self.visited_states:
+                if trace:
+                    LOG_SHOOT.debug('position %i, %i with direction %i, %i was already traced', current_x, current_y, laser.xdir, laser.ydir)
+                break
+            self.visited_states.add(state)
+            steps += 1
+
+            bit = 1 << (current_y*self.g_width + current_x)
+            if bit & self.target_mask:
+                self.lit_targets |= bit
+                if self.stop_when_solved and self.lit_targets == self.target_mask:
+                    break
+
+            # the points are packed as Laser.pack() does
+            path.append((next_y << 16) + next_x)
+
+            # the direction changes every time the laser is reflected, so read it again at every step
+            xdir, ydir = laser.get_direction()
+            block = self.facing_block(current_x, current_y, xdir, ydir)
+
+            if block == REFLECT:
                 face_number = self.get_block_face(current_x,current_y)
-                # laser.add_to_path([current_x, current_y])
-                print('direction before reflecting: '+ str(xdir) + ', ' + str(ydir))
-                print('position: '+str(current_x)+', '+str(current_y))
-                print('in face type: '+str(face_number))
+                path.pop() #removes the appended next step
                 laser.reflect(xdir, ydir, face_number)
-                print('it got reflected before entering the board')
-                # # xdir, ydir = laser.get_direction()
-                print('direction after reflecting: '+ str(laser.xdir) + ', ' + str(laser.ydir))
-        if self.grid[current_y][current_x] == OPAQUE:
-            print('opaque adj')
-            if (self.grid_faces[current_y][current_x] == 2 and self.grid[current_y][current_x+xdir] == OPAQUE) or (self.grid_faces[current_y][current_x] == 1 and self.grid[current_y+ydir][current_x] == OPAQUE):
-                # print('current position: ' + str(current_x) + ', ' + str(current_y))
-                # print('current direction: ' + str(xdir)+ ', ' + str(ydir))
-                # print('current face number: '+ str(self.grid_faces[current_y][current_x]))
-                face_number = self.get_block_face(current_x,current_y)
-                # laser.add_to_path([current_x, current_y])
-                laser.absorb(xdir, ydir, face_number)
-                # print('it got absorbed before entering board')
-        if self.grid[current_y][current_x] == REFRACT:
-            print('refract adj')
-            if (self.grid_faces[current_y][current_x] == 2 and self.grid[current_y][current_x+xdir] == REFRACT) or (self.grid_faces[current_y][current_x] == 1 and self.grid[current_y+ydir][current_x] == REFRACT):
-                face_number = self.get_block_face(current_x,current_y)
-                # laser.add_to_path([current_x, current_y])
-                print('direction of original laser before refracting: '+str(xdir)+', '+str(ydir))
-                laser2 = laser.refract(current_x, current_y, xdir, ydir, face_number)
-                print('direction of original laser after refracting: '+str(laser.xdir)+', '+str(laser.ydir))
-                print('direction of second beam after refracting: '+str(laser2.xdir)+', '+str(laser2.ydir))
-
+                if self.stats is not None:
+                    self.stats.counters["reflections"] += 1
+                if trace:
+                    LOG_SHOOT.debug('reflected at position %i, %i. New direction: %i, %i', current_x, current_y, laser.xdir, laser.ydir)
 
-                self.available_lasers.append(laser2)
-                print('laser was refracted in the edge block')
-                print('current lasers with all trajectories and directions (and if they were shot) are:')
-                for i in range(len(self.available_lasers)):
-                    print(self.available_lasers[i].get_trajectory())
-                    print(self.available_lasers[i].get_direction())
-                    print(self.available_lasers[i].was_shot)
+                next_x = current_x + laser.xdir
+                next_y = current_y + laser.ydir
+                path.append((next_y << 16) + next_x)
 
-        # print('trying to add a '+str(type(current_y))+' and a '+str(type(laser.ydir)))#+' should result in '+str(current_y+laser.ydir))
+            elif block == OPAQUE:
+                face_number = self.get_block_face(current_x,current_y)
+                path.pop()
+                laser.absorb(xdir, ydir, face_number)
+                if self.stats is not None:
+                    self.stats.counters["absorptions"] += 1
+                if trace:
+                    LOG_SHOOT.debug('absorbed at position %i, %i', current_x, current_y)
 
-        next_x = current_x + laser.xdir
-        next_y = current_y + laser.ydir
-        # if laser.get_trajectory()[-1] != [-2,-2]:
-        #     next_x = current_x + laser.xdir
-        #     next_y = current_y + laser.ydir
-
-        # if laser.get_trajectory()[-1] == [-2,-2]:
-        #     next_x = -2
-        #     next_y = -2
-        # print('next step is: '+ str(next_x) + ', ' + str(next_y))
-        # print('is it within the maze?')
-        # print(self.within_bounds(self.grid, next_x, next_y))
-
-        while self.within_bounds(self.grid, next_x, next_y) and laser.get_trajectory()[-1] != [-2,-2]:
-            print('while loop in shoot')
-
-            # for i in range(len(self.board)):
-            #     print(self.board[i])
-
-            # print("trajectory so far:")
-            # print(next_x)
-
-            if self.within_bounds(self.grid, next_x, next_y) == True:
-
-                laser.add_to_path([next_x, next_y])
-                print('traj after adding potential next step: '+ str(laser.get_trajectory()))
-
-                if self.grid[current_y][current_x] == REFLECT:
-                    print('im touching a reflect block')
-                    if (self.grid_faces[current_y][current_x] == 2 and self.grid[current_y][current_x+xdir] == REFLECT) or (self.grid_faces[current_y][current_x] == 1 and self.grid[current_y+ydir][current_x] == REFLECT):
-                        # print('current position: ' + str(current_x) + ', ' + str(current_y))
-                        # print('current direction: ' + str(xdir)+ ', ' + str(ydir))
-                        # print('current face number: '+ str(self.grid_faces[current_y][current_x]))
-                        # print('center in this direction: '+ str(self.grid[current_y+ydir][current_x]))
-                        # print('reflect is number ' + str(REFLECT))
-                        # print('current path before pop: '+ str(laser.path))
-                        face_number = self.get_block_face(current_x,current_y)
-                        laser.path.pop() #removes the appended next step
-                        # laser.add_to_path([current_x, current_y])
-                        # print('current path after pop: '+ str(laser.path))
-                        # print('2direction before reflecting: '+ str(xdir) + ', ' + str(ydir))
-                        laser.reflect(xdir, ydir, face_number)
-                        # xdir, ydir = laser.get_direction()
-                        # print('2direction after reflecting: '+ str(xdir) + ', ' + str(ydir))
-                        print('it was reflected at position: '+str(current_x)+', '+str(current_y))
-
-                        next_x = current_x + laser.xdir
-                        next_y = current_y + laser.ydir
-                        laser.add_to_path([next_x,next_y])
-
-                if self.grid[current_y][current_x] == OPAQUE:
-                    # print('im touching an opaque block')
-                    if (self.grid_faces[current_y][current_x] == 2 and self.grid[current_y][current_x+xdir] == OPAQUE) or (self.grid_faces[current_y][current_x] == 1 and self.grid[current_y+ydir][current_x] == OPAQUE):
-                        # print('current position: ' + str(current_x) + ', ' + str(current_y))
-                        # print('current direction: ' + str(xdir)+ ', ' + str(ydir))
-                        # print('current face number: '+ str(self.grid_faces[current_y][current_x]))
-                        # print('corresponding center in this direction: '+ str(self.grid[current_y][current_x+xdir]))
-                        # print('opaque is number ' + str(OPAQUE))
-                        # print('current path so far: '+ str(laser.path))
-                        face_number = self.get_block_face(current_x,current_y)
-                        laser.path.pop() 
-                        # laser.add_to_path([current_x, current_y])
-                        laser.absorb(xdir, ydir, face_number)
-                        print('it was absorbed at position: '+str(current_x)+', '+str(current_y))
-
-                if self.grid[current_y][current_x] == REFRACT:
-                    print('im touching a refractive block')
-                    if (self.grid_faces[current_y][current_x] == 2 and self.grid[current_y][current_x+laser.xdir] == REFRACT) or (self.grid_faces[current_y][current_x] == 1 and self.grid[current_y+laser.ydir][current_x] == REFRACT):
-                        face_number = self.get_block_face(current_x,current_y)
-                        # laser.add_to_path([current_x, current_y])
-                        print('2direction of original laser before refracting: '+str(laser.xdir)+', '+str(laser.ydir))
-                        print('trajectory of main laser so far: ')
-                        print(laser.get_trajectory())
-                        initial_for_second = laser.path.pop()
-                        print('trajectory after popping: ')
-                        print(laser.get_trajectory())
-                        laser2 = laser.refract(initial_for_second[0]-laser.xdir, initial_for_second[1]-laser.ydir, laser.xdir, laser.ydir, face_number)
-                        print('laser beam was refracted at position '+str(current_x)+', '+str(current_y))
-                        print('2direction of original laser after refracting: '+str(laser.xdir)+', '+str(laser.ydir))
-                        print('2direction of second beam after refracting: '+str(laser2.xdir)+', '+str(laser2.ydir))
-                        self.available_lasers.append(laser2)
-                        print('2current lasers with all trajectories (and if they were shot) are:')
-                        print(self.available_lasers)
-                        next_x = current_x + laser.xdir
-                        next_y = current_y + laser.ydir
-
-                        for i in range(len(self.available_lasers)):
-                            print(self.available_lasers[i].get_trajectory())
-                            print(self.available_lasers[i].get_position())
-                            print(self.available_lasers[i].was_shot)
-
-
-
-            else: 
-                laser.add_to_path([-1, -1])
-
-            print('current: '+str(current_x)+', '+str(current_y))
-            print('is being replaced by: '+str(next_x)+', '+str(next_y))
+            elif block == REFRACT:
+                face_number = self.get_block_face(current_x,current_y)
+                path.pop()
+                if self.stats is not None:
+                    self.stats.counters["refractions"] += 1
+                # the refracted laser goes on through the block. It is only created and queued if no other laser starts or went through the same point in the same direction, otherwise the beam is just reflected
+                start = (current_x + xdir, current_y + ydir, xdir, ydir)
+                if start not in self.visited_states and start not in self.queued_states:
+                    laser2 = laser.refract(current_x, current_y, xdir, ydir, face_number)
+                    laser2.trace = laser.trace
+                    self.queued_states.add(start)
+                    self.available_lasers.append(laser2)
+                else:
+                    laser.reflect(xdir, ydir, face_number)
+                if trace:
+                    LOG_SHOOT.debug('refracted at position %i, %i. New direction: %i, %i. Direction of the second beam: %i, %i', current_x, current_y, laser.xdir, laser.ydir, xdir, ydir)
+
+                next_x = current_x + laser.xdir
+                next_y = current_y + laser.ydir
+                path.append((next_y << 16) + next_x)
 
             current_x = next_x
             current_y = next_y
-            print('now the current is: '+str(current_x)+', '+str(current_y))
-            print('nd the path is: '+str(laser.get_trajectory()))
             next_x = current_x + laser.xdir
             next_y = current_y + laser.ydir
-            print('if we follow direction: '+str(laser.xdir)+', '+str(laser.ydir))
-            print('the next up is: '+str(next_x)+', '+str(next_y))
+        else:
+            # the laser leaves the grid from its last point, which is a state of its own (unless a reflection already took it out of the grid)
+            state = (current_x, current_y, laser.xdir, laser.ydir)
+            if path[-1] != absorbed and self.within_bounds(self.grid, current_x, current_y) and state not in self.visited_states:
+                self.visited_states.add(state)
+                steps += 1
+
+        # the last point of the trajectory is not checked in the loop (absorbed lasers end with [-2,-2] instead)
+        last_x, last_y = Laser.unpack(path[-1])
+        if self.within_bounds(self.grid, last_x, last_y):
+            bit = 1 << (last_y*self.g_width + last_x)
+            if bit & self.target_mask:
+                self.lit_targets |= bit
 
         laser.was_shot = True
-        laser.path.append([-1,-1])
+        self.steps += steps
+        if self.stats is not None:
+            self.stats.counters["steps"] += steps
+        path.append(Laser.END)
+
+        if trace:
+            LOG_SHOOT.debug('laser %i, %i finished. Trajectory: %s', laser.x, laser.y, laser.get_trajectory())
+
+
+
+class TransitionTable():
+    '''
+    Board compiled into a table of laser transitions, so that shooting the lasers is just a walk through the table.
+
+    The state of a beam is its grid position and direction, packed as state = 4*(y*g_width + x) + direction (see DIRECTIONS). For every state, the table holds the states the beam goes to in the next step: none (absorbed or leaving the grid), one, or two (refracted).
+
+    A transition only depends on the block the beam is heading into, so the transitions for every block type are compiled once. set_block() then just picks, for the 8 states heading into the block that changed, the transitions of its new type.
+    '''
+
+    def __init__(self, game):
+        '''
+        Compiles the board of a game. The game must have its board and grids created already, and is updated in place by set_block().
+        '''
+        self.game = game
+        self.width = game.g_width
+        self.table = [()] * (game.g_width * game.g_height * 4)
+        self.options = [None] * len(self.table) # transitions of each state, indexed by the value of the block it heads into
+        self.block_states = {} # (x, y) board position -> states heading into that block
+        self.placed = {} # (x, y) board position -> type of the blocks put by set_placement()
+        self.steps = 0 # states walked through by shoot() and targets_hit() so far (see SolveStats)
+
+        for y in range(game.g_height):
+            for x in range(game.g_width):
+                # lasers only go through the faces of the blocks: one coordinate odd and the other even
+                if (x + y) % 2 == 1:
+                    for d in range(4):
+                        self.compile_state(x, y, d)
+
+        self.starts = []
+        for i in range(len(game.lasers_pos)):
+            x, y = game.lasers_pos[i]
+            self.starts.append(4*(y*self.width + x) + DIRECTIONS.index(tuple(game.lasers_dir[i])))
+        self.target_points = [t[1]*self.width + t[0] for t in game.targets]
+        self.target_flags = bytearray(len(self.table) // 4)
+        for p in self.target_points:
+            self.target_flags[p] = 1
+        self.n_targets = sum(self.target_flags)
+
+    def next_states(self, x, y, dirs):
+        states = []
+        for xdir, ydir in dirs:
+            next_x = x + xdir
+            next_y = y + ydir
+            if self.game.within_bounds(self.game.grid, next_x, next_y):
+                states.append(4*(next_y*self.width + next_x) + DIRECTIONS.index((xdir, ydir)))
+        return tuple(states)
+
+    def compile_state(self, x, y, d):
+        '''
+        Compiles the transitions of a laser that gets to the x and y grid position going in the direction d, for every type of block it can be heading into.
+        '''
+        game = self.game
+        state = 4*(y*self.width + x) + d
+        xdir, ydir = DIRECTIONS[d]
+        if game.get_block_face(x, y) == 1:
+            reflected = (xdir, -ydir)
+            center_x, center_y = x, y + ydir
+        else:
+            reflected = (-xdir, ydir)
+            center_x, center_y = x + xdir, y
+
+        straight = self.next_states(x, y, [(xdir, ydir)])
+        if not game.within_bounds(game.grid, center_x, center_y):
+            self.table[state] = straight
+            return
+
+        options = [()] * 5
+        options[VALID] = straight
+        options[INVALID] = straight
+        options[OPAQUE] = ()
+        options[REFLECT] = self.next_states(x, y, [reflected])
+        # the refracted beam keeps the same direction
+        options[REFRACT] = self.next_states(x, y, [(xdir, ydir), reflected])
+
+        self.options[state] = options
+        self.table[state] = options[game.grid[center_y][center_x]]
+        self.block_states.setdefault(((center_x-1)//2, (center_y-1)//2), []).append(state)
+
+    def set_block(self, x, y, value):
+        '''
+        Puts a block of the given type (or VALID to remove it) in the x and y position of the board, and updates the table entries of the states heading into it.
+        '''
+        if self.game.board[y][x] == value:
+            return
+        self.game.set_block(x, y, value)
+        for state in self.block_states[(x, y)]:
+            self.table[state] = self.options[state][value]
+
+    def set_placement(self, placement):
+        '''
+        Puts the blocks of a placement (as yielded by iter_placements()) and removes the blocks of the previous placement that are not in it, so only the blocks that differ are updated.
+        '''
+        blocks = dict(((x, y), block_type) for x, y, block_type in placement)
+        for x, y in self.placed:
+            if (x, y) not in blocks:
+                self.set_block(x, y, VALID)
+        for (x, y), block_type in blocks.items():
+            self.set_block(x, y, block_type)
+        self.placed = blocks
+
+    def shoot(self):
+        '''
+        Shoots all the lasers through the table.
+
+        **Returns**
+
+            lit: *bytearray*
+                1 for every grid point (y*g_width + x) that a laser goes through, 0 otherwise
+        '''
+        table = self.table
+        seen = bytearray(len(table))
+        lit = bytearray(len(table) // 4)
+        pending = list(self.starts)
+        steps = 0
+
+        while pending:
+            state = pending.pop()
+            # a state that was already reached has all its next states traced or pending
+            if seen[state]:
+                continue
+            seen[state] = 1
+            steps += 1
+            lit[state >> 2] = 1
+            pending.extend(table[state])
+        self.steps += steps
+        return lit
+
+    def hit_all_targets(self):
+        '''
+        Shoots all the lasers and returns True if every target is in the trajectory of a laser. The lasers stop as soon as all the targets are hit.
+        '''
+        return self.targets_hit() == self.n_targets
+
+    def targets_hit(self):
+        '''
+        Shoots all the lasers and returns the number of targets in the trajectories of the lasers. The lasers stop as soon as all the targets are hit.
+        '''
+        table = self.table
+        seen = bytearray(len(table))
+        targets_left = bytearray(self.target_flags)
+        n_left = self.n_targets
+        if n_left == 0:
+            return 0
+        pending = list(self.starts)
+        steps = 0
+
+        while pending:
+            state = pending.pop()
+            if seen[state]:
+                continue
+            seen[state] = 1
+            steps += 1
+            if targets_left[state >> 2]:
+                targets_left[state >> 2] = 0
+                n_left -= 1
+                if n_left == 0:
+                    break
+            pending.extend(table[state])
+        self.steps += steps
+        return self.n_targets - n_left
+
+
+
+class Beam():
+    '''
+    Part of a laser beam traced by BeamTrace: the laser itself or a beam that was split off by a refractive block. The trajectory is kept as the packed states (position and direction, see BeamTrace) the beam went through, in an array of ints instead of a list of small lists, together with the beams that were split from it.
+    '''
+    __slots__ = ("states", "children", "waiting_on")
+
+    def __init__(self):
+        self.states = array.array("i")
+        self.children = [] # (index in states where the beam was split, beam id)
+        self.waiting_on = None # state where the beam stopped because another beam had already been there
+
+
+class BeamTrace():
+    '''
+    Keeps the trajectories of all the lasers of a game up to date while blocks are put in or removed from the board one at a time.
+
+    A block can only change the beams at its four faces. When a block changes, every beam that goes through one of its faces is cut at the first of those points (removing the beams it split off after that point) and traced again from there. Every other beam is kept as it is.
+
+    The grid point -> beams index also makes checking the targets a lookup per target.
+
+    Every state (position and direction) is traced by one beam only. A beam that gets to a state already traced (by another beam, or by itself if it goes in a loop) stops there and waits on it. If that state is later cut from the beam that traced it, the waiting beam goes on from there. This way the tracing always ends and beams split over and over by refractive blocks are not traced twice.
+
+    States are packed like in TransitionTable: state = 4*point + direction with point = y*g_width + x (see DIRECTIONS), so state >> 2 is the grid point.
+    '''
+
+    def __init__(self, game):
+        '''
+        Shoots all the lasers of the game. The game must have its board and grids created already, and is updated in place by set_block().
+        '''
+        self.game = game
+        self.width = game.g_width
+        self.beams = {}
+        self.points = {} # grid point -> ids of the beams that go through it
+        self.states = {} # state -> id of the beam that traced that state
+        self.waiters = {} # state -> ids of the beams that stopped at that state
+        self.freed = [] # states removed by cut_beam() and remove_beam()
+        self.next_id = 0
+        self.steps = 0 # states traced (or traced again after a change), see SolveStats
+
+        for i in range(len(game.lasers_pos)):
+            x, y = game.lasers_pos[i]
+            xdir, ydir = game.lasers_dir[i]
+            self.trace(self.new_beam(), x, y, xdir, ydir)
+
+    def new_beam(self):
+        beam_id = self.next_id
+        self.next_id += 1
+        self.beams[beam_id] = Beam()
+        return beam_id
+
+    def add_point(self, beam_id, state):
+        self.beams[beam_id].states.append(state)
+        self.points.setdefault(state >> 2, set()).add(beam_id)
+
+    def unpack(self, state):
+        '''
+        Returns the x, y grid position and the xdir, ydir direction of a packed state.
+        '''
+        x, y = (state >> 2) % self.width, (state >> 2) // self.width
+        xdir, ydir = DIRECTIONS[state & 3]
+        return x, y, xdir, ydir
+
+    def trace(self, beam_id, x, y, xdir, ydir):
+        '''
+        Traces a beam that gets to the x and y grid position going in the xdir and ydir direction, and all the beams split from it, until they leave the grid or are absorbed.
+        '''
+        game = self.game
+        width = self.width
+        pending = [(beam_id, x, y, xdir, ydir)]
+
+        while len(pending) > 0:
+            beam_id, x, y, xdir, ydir = pending.pop()
+            beam = self.beams[beam_id]
+            # index of the direction in DIRECTIONS. Reflecting on a face 1 flips its first bit, on a face 2 the second one
+            d = 2*(xdir < 0) + (ydir < 0)
+
+            while True:
+                state = 4*(y*width + x) + d
+                if state in self.states:
+                    beam.waiting_on = state
+                    self.waiters.setdefault(state, set()).add(beam_id)
+                    break
+                self.states[state] = beam_id
+                self.steps += 1
+                self.add_point(beam_id, state)
+                block = game.facing_block(x, y, xdir, ydir)
+
+                if block == OPAQUE:
+                    break
+                if block == REFRACT:
+                    # the refracted beam goes through the block and continues from the opposite face
+                    child = self.new_beam()
+                    beam.children.append((len(beam.states) - 1, child))
+                    self.add_point(child, state)
+                    pending.append((child, x + xdir, y + ydir, xdir, ydir))
+                if block == REFLECT or block == REFRACT:
+                    if game.get_block_face(x, y) == 1:
+                        ydir = -ydir
+                        d ^= 1
+                    else:
+                        xdir = -xdir
+                        d ^= 2
+
+                x = x + xdir
+                y = y + ydir
+                if not game.within_bounds(game.grid, x, y):
+                    break
+
+    def release_states(self, beam_id, beam, step):
+        '''
+        Frees the states traced by a beam from the given step on, and stops it from waiting on another state.
+        '''
+        for state in beam.states[step:]:
+            if self.states.get(state) == beam_id:
+                del self.states[state]
+                self.freed.append(state)
+        if beam.waiting_on is not None:
+            self.waiters[beam.waiting_on].discard(beam_id)
+            beam.waiting_on = None
+
+    def remove_beam(self, beam_id):
+        beam = self.beams.pop(beam_id)
+        for step, child in beam.children:
+            self.remove_beam(child)
+        self.release_states(beam_id, beam, 0)
+        for point in set(state >> 2 for state in beam.states):
+            self.points[point].discard(beam_id)
+
+    def cut_beam(self, beam_id, step):
+        '''
+        Removes the points of a beam from the given step on, and the beams that were split from it at those points.
+        '''
+        beam = self.beams[beam_id]
+        for split_step, child in beam.children:
+            if split_step >= step:
+                self.remove_beam(child)
+        beam.children = [c for c in beam.children if c[0] < step]
+        self.release_states(beam_id, beam, step)
+
+        removed = set(state >> 2 for state in beam.states[step:])
+        del beam.states[step:]
+        kept = set(state >> 2 for state in beam.states)
+        for point in removed:
+            if point not in kept:
+                self.points[point].discard(beam_id)
+
+    def set_block(self, x, y, value):
+        '''
+        Puts a block of the given type (or VALID to remove it) in the x and y position of the board, and re-traces only the beams that go through the faces of that block.
+
+        **Parameters**
+
+            x: *int*
+                x position of the board block (not of the grids)
+            y: *int*
+                y position of the board block (not of the grids)
+            value: *int or codeword*
+                REFLECT, OPAQUE, REFRACT or VALID
+        '''
+        if self.game.board[y][x] == value:
+            return
+        faces = self.game.set_block(x, y, value)
+
+        first_step = {}
+        for face_x, face_y in faces:
+            face = face_y*self.width + face_x
+            for beam_id in self.points.get(face, ()):
+                states = self.beams[beam_id].states
+                step = 0
+                while states[step] >> 2 != face:
+                    step += 1
+                first_step[beam_id] = min(first_step.get(beam_id, step), step)
+
+        # beams split from another beam always have a larger id, so parents are cut first
+        for beam_id in sorted(first_step):
+            if beam_id not in self.beams:
+                continue
+            step = first_step[beam_id]
+            state = self.beams[beam_id].states[step]
+            self.cut_beam(beam_id, step)
+            self.trace(beam_id, *self.unpack(state))
+
+        # beams that stopped at a state that nobody traces anymore go on from there
+        while len(self.freed) > 0:
+            state = self.freed.pop()
+            if state in self.states:
+                continue
+            for beam_id in list(self.waiters.pop(state, ())):
+                if beam_id in self.beams and self.beams[beam_id].waiting_on == state:
+                    self.beams[beam_id].waiting_on = None
+                    self.trace(beam_id, *self.unpack(state))
+
+    def trajectories(self):
+        '''
+        Returns the path of every beam as a list of [x, y] points.
+        '''
+        return [[list(self.unpack(state)[:2]) for state in beam.states] for beam in self.beams.values()]
 
-        # print(laser.path)
+    def hit_all_targets(self):
+        '''
+        Returns True if every target of the game is in the path of a beam.
+        '''
+        return all(len(self.points.get(t[1]*self.width + t[0], ())) > 0 for t in self.game.targets)
+
+    def blocks_touched(self):
+        '''
+        Returns the board positions of the blocks whose faces are crossed by any beam. A block put in any other position of the board would not change the beams.
+        '''
+        touched = set()
+        for point, beam_ids in self.points.items():
+            if len(beam_ids) > 0:
+                x, y = point % self.width, point // self.width
+                touched.update(point_to_blocks(x, y, self.game.b_width, self.game.b_height))
+        return touched
 
 
 
@@ -779,14 +2583,35 @@ class Block():
 
 
 class Laser():
+    '''
+    Laser beam shot by Game.shoot(): a laser of the board, or a beam split off by a refractive block. The path is kept as packed points (see pack()) in an array of ints instead of a list of small lists, and get_trajectory() unpacks it.
+    '''
+    __slots__ = ("x", "y", "xdir", "ydir", "path", "was_shot", "trace")
+
+    # packed points [-2, -2] (the laser was absorbed) and [-1, -1] (end of the path of a laser shot)
+    ABSORBED = (-2 << 16) - 2
+    END = (-1 << 16) - 1
 
     def __init__(self, x, y, xdir, ydir):
         self.x = x
         self.y = y
         self.xdir = xdir
         self.ydir = ydir
-        self.path = [[x, y]] #initiate the path with the starting position
+        self.path = array.array("i", (self.pack(x, y),)) #initiate the path with the starting position
         self.was_shot = False
+        self.trace = False # log the trajectory of this laser step by step (see Game.shoot())
+
+    @staticmethod
+    def pack(x, y):
+        '''
+        Packs a point of the path into an int. Coordinates can be negative (a laser reflected out of the grid, and the [-2, -2] and [-1, -1] markers).
+        '''
+        return (y << 16) + x
+
+    @staticmethod
+    def unpack(point):
+        x = ((point + 0x8000) & 0xffff) - 0x8000
+        return x, (point - x) >> 16
 
     def get_position(self):
         '''
@@ -808,7 +2633,7 @@ class Laser():
             next_step: *list* 
                 list of the x and y coordinates in the next step in the format  [x, y]
         '''
-        self.path.append(next_step)
+        self.path.append(self.pack(next_step[0], next_step[1]))
 
     def get_trajectory(self):
         '''
@@ -816,16 +2641,10 @@ class Laser():
 
         **Returns** 
 
-            self.path: *list of tuples*
-                list with every position tuple (x,y) that the beam has gone through.
+            self.path: *list of lists*
+                list with every position [x, y] that the beam has gone through.
         '''
-        return self.path
-
-    def was_shot(self):
-        '''
-        Returns a boolean representing if the laser was shot
-        '''
-        return self.was_shot
+        return [list(self.unpack(point)) for point in self.path]
 
 
     def reflect(self, xdir, ydir, face_number):
@@ -896,7 +2715,7 @@ class Laser():
 
         self.xdir = 0
         self.ydir = 0
-        self.path.append([-2,-2])
+        self.path.append(Laser.ABSORBED)
 
         
 
@@ -928,7 +2747,7 @@ class Laser():
         '''
         refracted_laser = Laser(x, y, xdir, ydir) #creates a second laser from the refracting point, that continues the same path as previously.
         # since this refracted laser will have an adjacent refractive block always, add the first two steps to path from the beginning to avoid refracting the beam double.
-        refracted_laser.path.append([x+xdir, y+ydir])
+        refracted_laser.path.append(self.pack(x + xdir, y + ydir))
         if face_number==1:
 
             second_xdir = xdir
@@ -946,15 +2765,39 @@ class Laser():
 
 
 if __name__ == "__main__":
-    # solved, winning_board = solve_game("dark_1.bff")
-    # solved, winning_board = solve_game("showstopper_4.bff")
-    # solved, winning_board = solve_game("mad_4.bff") # yes but slower
-    # solved, winning_board = solve_game("numbered_6.bff")
-
-
-    # solved, winning_board = solve_game("tiny_5.bff")
-    solved, winning_board = solve_game("mad_1.bff")
-
-    print('in main')
-    for i in range(len(winning_board)):
-        print(winning_board[i])
+    parser = argparse.ArgumentParser(description="Solve Lazor boards (.bff files).")
+    parser.add_argument("paths", nargs="*", default=["mad_1.bff"], help=".bff or .lzc files, glob patterns or directories of .bff files")
+    parser.add_argument("--mode", default="backtrack", choices=["random", "exhaustive", "backtrack", "anytime"], help="solve mode used for every file")
+    parser.add_argument("--budget", type=float, default=None, help="seconds the anytime mode can take for every file")
+    parser.add_argument("--processes", type=int, default=None, help="number of worker processes (the number of CPUs by default)")
+    parser.add_argument("--verbose", action="store_true", help="show the progress of the solver. Lines of different files are mixed")
+    parser.add_argument("--profile", action="store_true", help="show the counters and the time spent in every stage of the solver")
+    parser.add_argument("--cache", default=None, help="sqlite file where the solutions are cached between runs")
+    parser.add_argument("--compile", default=None, metavar="OUTPUT", help="compile the .bff files into a corpus file (.lzc) instead of solving them")
+    args = parser.parse_args()
+
+    if args.compile is not None:
+        print("%i puzzles compiled into %s" % (compile_puzzles(find_levels(args.paths), args.compile), args.compile))
+        sys.exit(0)
+
+    # use logging.DEBUG to also trace the lasers
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING, format="%(message)s")
+
+    n_files = 0
+    n_solved = 0
+    for result in solve_batch(args.paths, args.mode, args.processes, args.profile, args.cache, args.budget, render=True):
+        n_files += 1
+        if result.status == "error":
+            print("%s: error (%s)" % (result.filename, result.error))
+            continue
+        print("%s: %s in %.2f s%s" % (result.filename, result.status, result.seconds, " (cached)" if result.stats.cached else ""))
+        if result.status == "solved":
+            n_solved += 1
+        elif result.stats.mode == "anytime":
+            print("    best board found hits %i of %i targets%s" % (result.stats.targets_hit, result.stats.n_targets, " (time budget used up)" if result.stats.timed_out else ""))
+        if result.board is not None:
+            for row in result.board:
+                print("    %s" % row)
+        if args.profile:
+            result.stats.dump()
+    print("%i of %i files solved" % (n_solved, n_files))
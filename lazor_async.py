@@ -0,0 +1,146 @@
+'''
+Asyncio front end of the Lazor solver: the searches run in a pool of warm
+worker processes (see lazor_service), so the event loop is never blocked,
+and identical puzzles submitted while one of them is being solved share the
+same search:
+
+    async with AsyncSolver(processes=4) as solver:
+        result = await solver.solve(open("mad_1.bff").read(), timeout=10)
+
+A caller that times out or is cancelled stops waiting right away. When no
+other caller waits for the search, it is cancelled if it has not started
+yet, and otherwise its stop flag is set: the worker process checks the flag
+while searching (see solve_puzzle()), so it gives up and is free for the
+next search.
+'''
+import asyncio
+import concurrent.futures
+import multiprocessing
+import shutil
+import tempfile
+import threading
+
+import FINAL_LAZOR_PROJECT_extended as lazor
+import lazor_service
+
+
+# number of stop flags shared with the workers: searches submitted while all of them are in use can not be stopped once they run
+STOP_SLOTS = 1024
+
+
+class AsyncSolver():
+    '''
+    Solves puzzles in a process pool from asyncio code (see solve()).
+    '''
+
+    def __init__(self, processes=None, workdir=None, cache_file=None):
+        self._tempdir = None
+        if workdir is None:
+            workdir = self._tempdir = tempfile.mkdtemp()
+        # the flags are given to the workers when they start (see lazor_service.StopFlag)
+        self._stop_flags = multiprocessing.RawArray("b", STOP_SLOTS)
+        self._free_slots = list(range(STOP_SLOTS))
+        self._slots_lock = threading.Lock()
+        self.executor = concurrent.futures.ProcessPoolExecutor(processes, initializer=lazor_service._init_worker,
+                                                               initargs=(workdir, cache_file, self._stop_flags))
+        # (puzzle hash, mode, profile, time budget) -> [future of the search, number of callers waiting for it, future of the job, stop slot]
+        self._inflight = {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        # the shutdown waits for the workers, so it is done outside of the event loop
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
+
+    def close(self):
+        # the running searches give up, so the workers exit quickly
+        for slot in range(STOP_SLOTS):
+            self._stop_flags[slot] = 1
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        if self._tempdir is not None:
+            shutil.rmtree(self._tempdir, ignore_errors=True)
+
+    def pending(self):
+        '''
+        Returns the number of searches queued or running.
+        '''
+        return len(self._inflight)
+
+    async def solve(self, puzzle, mode="backtrack", timeout=None, profile=False, time_budget=None):
+        '''
+        Solves a puzzle in the process pool.
+
+        **Parameters**
+
+            puzzle: *Puzzle or str*
+                puzzle to solve, or the contents of its .bff file
+            mode: *str, optional*
+                solve mode (see solve_game(), the parallel mode can not be used)
+            timeout: *float, optional*
+                seconds to wait for the solution before raising asyncio.TimeoutError (no limit by default)
+            profile: *bool, optional*
+                time the stages of the solve (see SolveStats)
+            time_budget: *float, optional*
+                seconds the anytime mode can take. Unlike the timeout, the search then returns the best board it found (see solve_anytime())
+
+        **Returns**
+
+            result: *dict*
+                solved, winning board (None if not solved), seconds spent and stats of the search (see lazor_service.solve_job())
+
+        Raises ValueError if the mode is unknown or the .bff file can not be read.
+        '''
+        if mode not in lazor_service.MODES:
+            raise ValueError("Unknown solve mode: %s" % mode)
+        if isinstance(puzzle, str):
+            puzzle = lazor.parse_puzzle(puzzle.splitlines(), "puzzle")
+
+        key = (lazor.puzzle_key(*puzzle.as_args()), mode, profile, time_budget)
+        entry = self._inflight.get(key)
+        if entry is None:
+            slot = self._take_slot()
+            job = self.executor.submit(lazor_service.solve_job, puzzle, mode, profile, time_budget, slot)
+            # the slot is only reused once the worker is done with the job, not when its callers stop waiting
+            job.add_done_callback(lambda done: self._release_slot(slot))
+            future = asyncio.wrap_future(job)
+            entry = self._inflight[key] = [future, 0, job, slot]
+            future.add_done_callback(lambda done: self._forget(key, done))
+
+        entry[1] += 1
+        try:
+            # shield() keeps the search going when this caller is cancelled, the others may still wait for it
+            result = await asyncio.wait_for(asyncio.shield(entry[0]), timeout)
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0 and not entry[0].done():
+                # a search that already runs can not be cancelled, it is told to stop instead
+                if not entry[2].cancel() and entry[3] is not None:
+                    self._stop_flags[entry[3]] = 1
+                entry[0].cancel()
+                self._forget(key, entry[0])
+        return dict(result)
+
+    def _take_slot(self):
+        '''
+        Returns a free stop slot, with its flag cleared (None if all of them are in use).
+        '''
+        with self._slots_lock:
+            if len(self._free_slots) == 0:
+                return None
+            slot = self._free_slots.pop()
+        self._stop_flags[slot] = 0
+        return slot
+
+    def _release_slot(self, slot):
+        if slot is not None:
+            with self._slots_lock:
+                self._free_slots.append(slot)
+
+    def _forget(self, key, future):
+        '''
+        Removes a finished (or abandoned) search, so the next caller with the same puzzle starts a new one.
+        '''
+        entry = self._inflight.get(key)
+        if entry is not None and entry[0] is future:
+            del self._inflight[key]
@@ -0,0 +1,118 @@
+'''
+Benchmark of the solve modes of FINAL_LAZOR_PROJECT_extended over a fixed
+corpus of levels.
+
+Every level is solved with every mode (and every seed for the random mode),
+recording the wall time, the iterations, the steps of the beams traced (see
+SolveStats) and the peak memory. The results are printed and saved as JSON, so that
+two versions of the solver can be compared:
+
+    python lazor_benchmark.py --levels path/to/bff/files --output before.json
+
+Levels missing from the levels folder are reported as missing and skipped.
+'''
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+import FINAL_LAZOR_PROJECT_extended as lazor
+
+
+# levels that the solver has been timed on so far (see __main__ of FINAL_LAZOR_PROJECT_extended.py)
+CORPUS = ["dark_1", "tiny_5", "mad_1", "mad_4", "showstopper_4", "numbered_6"]
+MODES = ["random", "exhaustive", "backtrack", "parallel", "anytime"]
+SEEDS = [0, 1, 2]
+
+
+def run_once(filename, mode, seed, memory=False):
+    '''
+    Solves one level with the given mode, with the random module seeded. No solution image is rendered, so the time is the one of the search.
+
+    **Parameters**
+
+        filename: *str*
+            .bff file of the level
+        mode: *str*
+            solve mode (see solve_game())
+        seed: *int*
+            seed of the random module
+        memory: *bool, optional*
+            trace the memory allocations (much slower) to measure the peak memory
+
+    **Returns**
+
+        stats: *SolveStats*
+            counters of the solve
+        seconds: *float*
+            wall time
+        peak: *int*
+            peak memory in bytes (None if memory is False)
+    '''
+    stats = lazor.SolveStats()
+    random.seed(seed)
+    if memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        lazor.solve_game(filename, mode, stats=stats, render=False)
+        seconds = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] if memory else None
+    finally:
+        if memory:
+            tracemalloc.stop()
+    return stats, seconds, peak
+
+
+def run_benchmark(levels_dir, levels=CORPUS, modes=MODES, seeds=SEEDS, memory=True):
+    '''
+    Runs every mode over every level and returns the list of results. Deterministic modes only run with the first seed.
+
+    The time is measured in a run without tracing the memory, and the peak memory in a second run with the same seed. For the parallel mode, the memory of the worker processes is not included.
+    '''
+    results = []
+    for level in levels:
+        filename = os.path.abspath(os.path.join(levels_dir, level + ".bff"))
+        if not os.path.exists(filename):
+            results.append({"level": level, "status": "missing"})
+            continue
+
+        for mode in modes:
+            for seed in (seeds if mode == "random" else seeds[:1]):
+                stats, seconds, peak = run_once(filename, mode, seed)
+                if memory:
+                    peak = run_once(filename, mode, seed, memory=True)[2]
+                result = {"level": level, "mode": mode, "seed": seed,
+                          "status": "solved" if stats.solved else "no solution",
+                          "seconds": round(seconds, 4), "peak_memory": peak}
+                result.update(stats.as_dict())
+                results.append(result)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the Lazor solve modes over a fixed corpus of levels.")
+    parser.add_argument("--levels", default=".", help="folder with the .bff files of the corpus")
+    parser.add_argument("--modes", nargs="+", default=MODES, help="solve modes to run")
+    parser.add_argument("--seeds", nargs="+", type=int, default=SEEDS, help="seeds of the random mode")
+    parser.add_argument("--no-memory", action="store_true", help="do not measure the peak memory (halves the running time)")
+    parser.add_argument("--output", default="lazor_benchmark.json", help="JSON file to write the results to")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.levels, CORPUS, args.modes, args.seeds, not args.no_memory)
+
+    for r in results:
+        if r["status"] == "missing":
+            print("%-14s missing" % r["level"])
+            continue
+        print("%-14s %-10s seed %-3i %-12s %9.4f s %9i iterations %10i steps %s"
+              % (r["level"], r["mode"], r["seed"], r["status"], r["seconds"], r["iterations"], r["steps"],
+                 "" if r["peak_memory"] is None else "%8.1f KiB" % (r["peak_memory"] / 1024)))
+
+    with open(args.output, "w") as f:
+        json.dump({"python": sys.version.split()[0], "platform": platform.platform(),
+                   "date": time.strftime("%Y-%m-%d %H:%M:%S"), "results": results}, f, indent=2)
@@ -0,0 +1,256 @@
+'''
+Local solver service: a long-running process that solves the .bff puzzles
+sent to it over HTTP with a pool of warm worker processes.
+
+The workers are started once, with the per-geometry tables of
+FINAL_LAZOR_PROJECT_extended (e.g. face_map()) kept between jobs, so a
+request only pays for the search. The boards are returned as JSON and no
+solution image is rendered, so the workers never load the image libraries:
+
+    python lazor_service.py --port 8765 --processes 4
+
+    curl --data-binary @mad_1.bff "http://127.0.0.1:8765/solve?mode=backtrack"
+
+Endpoints:
+
+    POST /solve      solves the .bff file in the body and returns the result
+    POST /jobs       queues the .bff file in the body and returns the job id
+    GET  /jobs/<id>  state of a job, with its result once it is done
+    GET  /status     number of workers and jobs
+
+The solve mode is given with ?mode= (backtrack by default) and ?profile=1
+times the stages of the solve (see SolveStats). ?budget= gives the seconds
+the anytime mode can take, for callers that need a bounded response time.
+The service only listens on 127.0.0.1 by default, as it has no
+authentication.
+'''
+import argparse
+import collections
+import http.server
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+import urllib.parse
+
+import FINAL_LAZOR_PROJECT_extended as lazor
+
+
+LOG_SERVICE = logging.getLogger("lazor.service")
+
+# the parallel mode can not be used, the workers of a pool can not start processes
+MODES = ["backtrack", "exhaustive", "random", "anytime"]
+
+# solution cache of a worker process, and the stop flags shared with the process that submits the jobs (see _init_worker())
+_CACHE = None
+_STOP_FLAGS = None
+
+
+class StopFlag():
+    '''
+    Stop event of a job (see solve_job()): one byte of an array shared by the worker processes, set by the process that submitted the job when nobody waits for its result anymore.
+    '''
+
+    def __init__(self, flags, slot):
+        self.flags = flags
+        self.slot = slot
+
+    def is_set(self):
+        return self.flags[self.slot] != 0
+
+
+def _init_worker(workdir, cache_file, stop_flags=None):
+    '''
+    Initializer of the worker processes: they run in the work directory, and open the solution cache once for all their jobs. stop_flags is a multiprocessing.RawArray of stop flags shared with the submitting process (see solve_job()).
+    '''
+    global _CACHE, _STOP_FLAGS
+    os.chdir(workdir)
+    _STOP_FLAGS = stop_flags
+    if cache_file is not None:
+        _CACHE = lazor.SolutionCache(cache_file)
+
+
+def solve_job(puzzle, mode, profile=False, time_budget=None, stop_slot=None):
+    '''
+    Solves a puzzle in a worker process.
+
+    **Parameters**
+
+        puzzle: *Puzzle*
+            puzzle to solve (see parse_puzzle())
+        mode: *str*
+            solve mode (see solve_game())
+        profile: *bool, optional*
+            time the stages of the solve (see SolveStats)
+        time_budget: *float, optional*
+            seconds the anytime mode can take (no limit by default)
+        stop_slot: *int, optional*
+            index of the stop flag of the job in the flags shared with the worker (see _init_worker()). The search gives up when the flag is set.
+
+    **Returns**
+
+        result: *dict*
+            solved, winning board (None if not solved, the best board found for the anytime mode), seconds spent and stats of the solve
+    '''
+    stats = lazor.SolveStats(profile)
+    start = time.perf_counter()
+    stop = None if stop_slot is None or _STOP_FLAGS is None else StopFlag(_STOP_FLAGS, stop_slot)
+    solved, board = lazor.solve_puzzle(puzzle, mode, stats=stats, cache=_CACHE, time_budget=time_budget, stop=stop, render=False)
+    return {"solved": solved, "board": board if solved or mode == "anytime" else None,
+            "seconds": time.perf_counter() - start, "stats": stats.as_dict()}
+
+
+class SolverService():
+    '''
+    Job queue of the service: the puzzles are parsed when they are submitted and solved by a multiprocessing pool. The results of the last max_jobs jobs are kept, older finished jobs are forgotten.
+    '''
+
+    def __init__(self, processes=None, workdir=None, cache_file=None, max_jobs=1000):
+        self.processes = processes or os.cpu_count() or 1
+        self.max_jobs = max_jobs
+        self._tempdir = None
+        if workdir is None:
+            workdir = self._tempdir = tempfile.mkdtemp()
+        self.pool = multiprocessing.Pool(self.processes, _init_worker, (workdir, cache_file))
+        # job id -> AsyncResult, in the order the jobs were submitted
+        self.jobs = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def submit(self, text, mode="backtrack", profile=False, time_budget=None):
+        '''
+        Queues the contents of a .bff file and returns the id of the job. Raises ValueError if the mode is unknown or the file can not be read (see parse_puzzle()).
+        '''
+        if mode not in MODES:
+            raise ValueError("Unknown solve mode: %s" % mode)
+        puzzle = lazor.parse_puzzle(text.splitlines(), "request")
+        with self.lock:
+            job_id = next(self._ids)
+            self.jobs[job_id] = self.pool.apply_async(solve_job, (puzzle, mode, profile, time_budget))
+            if len(self.jobs) > self.max_jobs:
+                for old_id in [i for i, job in self.jobs.items() if job.ready()][:len(self.jobs) - self.max_jobs]:
+                    del self.jobs[old_id]
+        LOG_SERVICE.info("job %i queued (%s)", job_id, mode)
+        return job_id
+
+    def result(self, job_id, timeout=0):
+        '''
+        Returns the state of a job as a dictionary: {"id", "state": "pending"} until it is done, then "done" with the result of solve_job(), or "error" with the error message. It waits for the job for up to timeout seconds (None waits until it is done). Raises KeyError for an unknown job.
+        '''
+        with self.lock:
+            job = self.jobs[job_id]
+        job.wait(timeout)
+        if not job.ready():
+            return {"id": job_id, "state": "pending"}
+        try:
+            result = job.get()
+        except Exception as error:
+            return {"id": job_id, "state": "error", "error": "%s: %s" % (type(error).__name__, error)}
+        result.update({"id": job_id, "state": "done"})
+        return result
+
+    def status(self):
+        '''
+        Returns the number of workers and of pending and finished jobs.
+        '''
+        with self.lock:
+            done = sum(1 for job in self.jobs.values() if job.ready())
+            return {"processes": self.processes, "pending": len(self.jobs) - done, "done": done}
+
+    def close(self):
+        self.pool.terminate()
+        self.pool.join()
+        if self._tempdir is not None:
+            shutil.rmtree(self._tempdir, ignore_errors=True)
+
+
+class ServiceHandler(http.server.BaseHTTPRequestHandler):
+    '''
+    HTTP front end of a SolverService (the service of the server, see make_server()).
+    '''
+
+    def send_json(self, code, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        url = urllib.parse.urlsplit(self.path)
+        if url.path not in ("/solve", "/jobs"):
+            self.send_json(404, {"error": "unknown path %s" % url.path})
+            return
+        query = urllib.parse.parse_qs(url.query)
+        mode = query.get("mode", ["backtrack"])[0]
+        profile = query.get("profile", ["0"])[0] not in ("0", "")
+        text = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode("utf-8", "replace")
+        try:
+            time_budget = float(query["budget"][0]) if "budget" in query else None
+            job_id = self.server.service.submit(text, mode, profile, time_budget)
+        except ValueError as error:
+            self.send_json(400, {"error": str(error)})
+            return
+
+        if url.path == "/jobs":
+            self.send_json(202, {"id": job_id, "state": "pending"})
+            return
+        result = self.server.service.result(job_id, timeout=None)
+        self.send_json(500 if result["state"] == "error" else 200, result)
+
+    def do_GET(self):
+        path = urllib.parse.urlsplit(self.path).path
+        if path == "/status":
+            self.send_json(200, self.server.service.status())
+            return
+        parts = path.strip("/").split("/")
+        if len(parts) == 2 and parts[0] == "jobs" and parts[1].isdigit():
+            try:
+                self.send_json(200, self.server.service.result(int(parts[1])))
+            except KeyError:
+                self.send_json(404, {"error": "unknown job %s" % parts[1]})
+            return
+        self.send_json(404, {"error": "unknown path %s" % path})
+
+    def log_message(self, format, *args):
+        LOG_SERVICE.debug("%s - %s", self.address_string(), format % args)
+
+
+def make_server(service, host="127.0.0.1", port=8765):
+    '''
+    Returns an HTTP server (one thread per request) for the service. Port 0 picks a free port (see server.server_address).
+    '''
+    server = http.server.ThreadingHTTPServer((host, port), ServiceHandler)
+    server.daemon_threads = True
+    server.service = service
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the Lazor solver over HTTP with a pool of warm worker processes.")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on")
+    parser.add_argument("--port", type=int, default=8765, help="port to listen on")
+    parser.add_argument("--processes", type=int, default=None, help="number of worker processes (the number of CPUs by default)")
+    parser.add_argument("--workdir", default=None, help="working folder of the worker processes (a temporary folder by default)")
+    parser.add_argument("--cache", default=None, help="sqlite file where the solutions are cached between runs")
+    parser.add_argument("--verbose", action="store_true", help="log the jobs and the requests")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING, format="%(message)s")
+
+    service = SolverService(args.processes, args.workdir, args.cache)
+    server = make_server(service, args.host, args.port)
+    print("solving on http://%s:%i with %i processes" % (server.server_address[0], server.server_address[1], service.processes))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
@@ -0,0 +1,696 @@
+import io
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import logging
+import unittest
+import FINAL_LAZOR_PROJECT_extended
+
+VALID = 0
+INVALID = 1
+REFRACT = 2
+OPAQUE = 3
+REFLECT = 4
+
+DARK_1 = '''GRID START
+x o o
+o o o
+o o x
+GRID STOP
+
+B 3
+
+L 3 0 -1 1
+L 1 6 1 -1
+L 3 6 -1 -1
+L 4 3 1 -1
+
+P 0 3
+P 6 1
+'''
+
+TINY_5 = '''GRID START
+o B o
+o o o
+o o o
+GRID STOP
+
+A 3
+C 1
+
+L 4 5 -1 -1
+
+P 1 2
+P 6 3
+'''
+
+
+class SolverTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        # The .bff files are not shipped with the repo, so the boards
+        # used in the tests are written to a temporary folder
+        cls.folder = tempfile.mkdtemp()
+        cls.dark_1 = os.path.join(cls.folder, "dark_1.bff")
+        with open(cls.dark_1, 'w') as f:
+            f.write(DARK_1)
+        cls.tiny_5 = os.path.join(cls.folder, "tiny_5.bff")
+        with open(cls.tiny_5, 'w') as f:
+            f.write(TINY_5)
+        cls.cwd = os.getcwd()
+        # solution images are saved in the working directory
+        os.chdir(cls.folder)
+
+    @classmethod
+    def tearDownClass(cls):
+        os.chdir(cls.cwd)
+        shutil.rmtree(cls.folder)
+
+    def new_game(self):
+        game = FINAL_LAZOR_PROJECT_extended.Game(
+            *FINAL_LAZOR_PROJECT_extended.read_file(self.dark_1))
+        game.create_board()
+        game.create_grid()
+        return game
+
+    def test_parse_puzzle(self):
+        # Coordinates with several digits, comments and the counts
+        # as ints, the legacy read_file() tuple is built from it
+        lines = ["# large board", "GRID START"] + ["o " * 6] * 6 + [
+            "GRID STOP", "A 2  # reflect", "L 12 7 -1 1", "P 10 11"]
+        puzzle = FINAL_LAZOR_PROJECT_extended.parse_puzzle(lines)
+        self.assertEqual(puzzle.board, ("oooooo",) * 6)
+        self.assertEqual(
+            (puzzle.n_reflect, puzzle.n_opaque, puzzle.n_refract), (2, 0, 0))
+        self.assertEqual(puzzle.lasers, ((12, 7, -1, 1),))
+        self.assertEqual(puzzle.targets, ((10, 11),))
+        self.assertEqual(
+            puzzle.as_args(),
+            (["oooooo"] * 6, [2, 0, 0], [[12, 7]], [[-1, 1]], [[10, 11]]))
+
+        puzzle = FINAL_LAZOR_PROJECT_extended.read_puzzle(self.dark_1)
+        self.assertEqual(
+            puzzle.as_args(),
+            FINAL_LAZOR_PROJECT_extended.read_file(self.dark_1))
+        game = FINAL_LAZOR_PROJECT_extended.Game.from_puzzle(puzzle)
+        self.assertEqual(
+            (game.n_reflect, game.n_opaque, game.n_refract), (0, 3, 0))
+        # the game reads the puzzle in place, and plays the same as the
+        # one built from read_file()
+        self.assertIs(game.board_str, puzzle.board)
+        self.assertIs(game.targets, puzzle.targets)
+        other = FINAL_LAZOR_PROJECT_extended.Game(
+            *FINAL_LAZOR_PROJECT_extended.read_file(self.dark_1))
+        for g in (game, other):
+            g.create_board()
+            g.create_grid()
+            g.shoot_all()
+        self.assertEqual(
+            [laser.get_trajectory() for laser in game.available_lasers],
+            [laser.get_trajectory() for laser in other.available_lasers])
+
+    def test_puzzle_corpus(self):
+        # The compiled corpus gives back the same puzzles, and the face
+        # maps and cells of the analysis are views of the file
+        corpus_file = os.path.join(self.folder, "levels.lzc")
+        self.assertEqual(
+            FINAL_LAZOR_PROJECT_extended.compile_puzzles(
+                [self.dark_1, self.tiny_5], corpus_file), 2)
+        game = self.new_game()
+        analysis = FINAL_LAZOR_PROJECT_extended.analyze_board(game)
+        with FINAL_LAZOR_PROJECT_extended.PuzzleCorpus(corpus_file) as corpus:
+            self.assertEqual(len(corpus), 2)
+            self.assertEqual(corpus.name(1), "tiny_5")
+            self.assertEqual(
+                list(corpus),
+                [FINAL_LAZOR_PROJECT_extended.read_puzzle(self.dark_1),
+                 FINAL_LAZOR_PROJECT_extended.read_puzzle(self.tiny_5)])
+            faces = corpus.face_map(0)
+            self.assertEqual(
+                bytes(faces), FINAL_LAZOR_PROJECT_extended.face_map(7, 7))
+            positions, restricted, reachable = corpus.candidates(0)
+            self.assertEqual(
+                list(positions), [v for p in analysis.positions for v in p])
+            self.assertEqual(
+                list(restricted), [v for p in analysis.restricted for v in p])
+            self.assertEqual(
+                list(reachable), [v for p in sorted(analysis.reachable)
+                                  for v in p])
+            del faces, positions, restricted, reachable
+            # the solvers get the same analysis from the corpus
+            self.assertEqual(corpus.analysis(0), analysis)
+            with self.assertRaises(IndexError):
+                corpus[2]
+
+        results = list(FINAL_LAZOR_PROJECT_extended.solve_batch(
+            [corpus_file], "exhaustive", processes=1))
+        self.assertEqual(
+            sorted((r.filename, r.status) for r in results),
+            [(corpus_file + ":dark_1", "solved"),
+             (corpus_file + ":tiny_5", "solved")])
+
+        # the version read from the file is reported, and names too long
+        # for the record header are refused
+        with open(corpus_file, "r+b") as f:
+            f.seek(4)
+            f.write(b"\x01\x00")
+        with self.assertRaisesRegex(ValueError, "version 1"):
+            FINAL_LAZOR_PROJECT_extended.PuzzleCorpus(corpus_file)
+        with self.assertRaisesRegex(ValueError, "too long"):
+            FINAL_LAZOR_PROJECT_extended.compile_puzzles(
+                [os.path.join(self.folder, "x"*5000 + ".bff")], corpus_file)
+
+    def test_parse_puzzle_errors(self):
+        grid = ["GRID START", "o o", "o o", "GRID STOP"]
+        for lines in (grid[:3],
+                      grid[:2] + ["o"] + grid[3:],
+                      grid[:2] + ["o z"] + grid[3:],
+                      grid + ["A two"],
+                      grid + ["L 1 0 1"],
+                      grid + ["L 1 0 2 1"],
+                      grid + ["P 5 1"],
+                      # corners and centers of blocks
+                      grid + ["L 0 0 1 1", "P 2 1"],
+                      grid + ["L 1 0 1 1", "P 2 2"],
+                      grid + grid):
+            with self.assertRaises(ValueError):
+                FINAL_LAZOR_PROJECT_extended.parse_puzzle(lines)
+
+    def test_iter_placements(self):
+        # Every placement is yielded exactly once, identical blocks
+        # are never permuted and the count is known beforehand
+        game = self.new_game()
+        positions = FINAL_LAZOR_PROJECT_extended.valid_positions(game)
+        restricted = FINAL_LAZOR_PROJECT_extended.analyze_board(
+            game).restricted
+        placements = list(FINAL_LAZOR_PROJECT_extended.iter_placements(
+            positions, 1, 2, 1, restricted))
+        distinct = set(tuple(sorted(p)) for p in placements)
+        self.assertEqual(len(placements), len(distinct))
+        self.assertEqual(
+            len(placements),
+            FINAL_LAZOR_PROJECT_extended.count_placements(
+                positions, 1, 2, 1, restricted))
+        for placement in placements:
+            for x, y, block_type in placement:
+                if block_type != REFRACT:
+                    self.assertNotIn([x, y], restricted)
+
+    def test_analyze_board(self):
+        game = FINAL_LAZOR_PROJECT_extended.Game(
+            *FINAL_LAZOR_PROJECT_extended.read_file(self.tiny_5))
+        game.create_board()
+        game.create_grid()
+        analysis = FINAL_LAZOR_PROJECT_extended.analyze_board(game)
+        # every beam that can get to a target goes through one cell: the
+        # one below 1, 2 and the one left of 6, 3 (on the edge)
+        self.assertEqual(analysis.restricted, [[0, 1], [2, 1]])
+        for x, y in analysis.parking:
+            self.assertNotIn((x, y), analysis.reachable)
+        self.assertLessEqual(len(analysis.parking), 4)
+
+    def test_pruning_regressions(self):
+        # The target (2, 1) is hit by the beam reflected on the fixed
+        # block (0, 1), which goes on without looking at the block (0, 0):
+        # (0, 0) is not restricted
+        Puzzle = FINAL_LAZOR_PROJECT_extended.Puzzle
+        puzzle = Puzzle(("oo", "Ao", "AC"), 1, 1, 1,
+                        ((4, 1, 1, -1), (1, 2, 1, 1)), ((2, 1),))
+        # The blocks not needed go in (0, 0) and (2, 0): beams touch the
+        # face of (2, 0) but never go into it
+        puzzle2 = Puzzle(("ooo", "ooo", "oBo"), 2, 0, 1,
+                         ((4, 1, -1, 1), (5, 6, -1, 1)), ((0, 5), (6, 3)))
+        for board_puzzle in (puzzle, puzzle2):
+            for solve in (FINAL_LAZOR_PROJECT_extended.solve_exhaustive,
+                          FINAL_LAZOR_PROJECT_extended.solve_backtrack):
+                self.assertTrue(solve(board_puzzle)[0])
+
+    def test_solve_exhaustive(self):
+        solved, board = FINAL_LAZOR_PROJECT_extended.solve_game(
+            self.dark_1, mode="exhaustive")
+        self.assertTrue(solved)
+        self.assertEqual(sum(row.count(OPAQUE) for row in board), 3)
+
+    def test_solve_anytime(self):
+        stats = FINAL_LAZOR_PROJECT_extended.SolveStats()
+        solved, board = FINAL_LAZOR_PROJECT_extended.solve_game(
+            self.dark_1, mode="anytime", stats=stats, time_budget=10)
+        self.assertTrue(solved)
+        self.assertEqual((stats.targets_hit, stats.n_targets), (2, 2))
+        self.assertFalse(stats.timed_out)
+
+        # No placement lights the extra target (0, 5): every placement is
+        # checked and the first one hitting the other two is returned
+        puzzle = FINAL_LAZOR_PROJECT_extended.read_puzzle(self.dark_1)
+        puzzle = puzzle._replace(targets=puzzle.targets + ((0, 5),))
+        stats = FINAL_LAZOR_PROJECT_extended.SolveStats()
+        solved, board = FINAL_LAZOR_PROJECT_extended.solve_anytime(
+            puzzle, stats=stats)
+        self.assertFalse(solved)
+        self.assertEqual(sum(row.count(OPAQUE) for row in board), 3)
+        self.assertEqual((stats.targets_hit, stats.n_targets), (2, 3))
+        self.assertFalse(stats.timed_out)
+        game = FINAL_LAZOR_PROJECT_extended.Game.from_puzzle(puzzle)
+        game.create_board()
+        game.create_grid()
+        positions, restricted = FINAL_LAZOR_PROJECT_extended.analyze_board(
+            game)[:2]
+        self.assertEqual(stats.iterations,
+                         FINAL_LAZOR_PROJECT_extended.count_placements(
+                             positions, 0, 0, 3, restricted))
+
+    def test_targets_hit(self):
+        game = self.new_game()
+        table = FINAL_LAZOR_PROJECT_extended.TransitionTable(game)
+        self.assertEqual(table.targets_hit(), 2)
+        table.set_placement([(2, 0, OPAQUE)])
+        self.assertEqual(table.targets_hit(), 1)
+        # the blocks of the previous placement are removed
+        table.set_placement([(1, 1, OPAQUE), (0, 2, OPAQUE), (1, 2, OPAQUE)])
+        self.assertEqual(game.board[0][2], VALID)
+        self.assertEqual(table.targets_hit(), 2)
+        self.assertTrue(table.hit_all_targets())
+
+    def test_random_placement(self):
+        # random placements are drawn in the canonical form of the
+        # exhaustive search, so swapped identical blocks are the same
+        game = self.new_game()
+        positions = FINAL_LAZOR_PROJECT_extended.valid_positions(game)
+        restricted = FINAL_LAZOR_PROJECT_extended.analyze_board(
+            game).restricted
+        placements = list(FINAL_LAZOR_PROJECT_extended.iter_placements(
+            positions, 1, 2, 1, restricted))
+        for _ in range(50):
+            self.assertIn(FINAL_LAZOR_PROJECT_extended.random_placement(
+                positions, 1, 2, 1, restricted), placements)
+
+    def test_solve_random_restricted(self):
+        # (0, 1) is restricted and the REFRACT block must not take the
+        # only position left for the REFLECT block
+        filename = os.path.join(self.folder, "restricted.bff")
+        with open(filename, 'w') as f:
+            f.write("GRID START\nA o\no B\nGRID STOP\nA 1\nC 1\n"
+                    "L 3 0 1 -1\nL 2 1 1 1\nP 2 1\nP 3 2\n")
+        for seed in range(20):
+            random.seed(seed)
+            self.assertTrue(FINAL_LAZOR_PROJECT_extended.solve_game(
+                filename, mode="random")[0])
+
+        # no placement at all: more REFLECT blocks than free positions
+        solved, board = FINAL_LAZOR_PROJECT_extended.solve_random(
+            FINAL_LAZOR_PROJECT_extended.Puzzle(
+                ("xo", "xx"), 2, 0, 0, ((1, 0, 1, 1),), ((2, 1),)))
+        self.assertFalse(solved)
+
+    def test_placement_prefixes(self):
+        # splitting by the first blocks walks every placement exactly
+        # once, in parts small enough to share the work evenly
+        game = self.new_game()
+        positions = FINAL_LAZOR_PROJECT_extended.valid_positions(game)
+        restricted = FINAL_LAZOR_PROJECT_extended.analyze_board(
+            game).restricted
+        for counts in [(1, 2, 1), (0, 2, 0), (0, 0, 3), (0, 0, 0)]:
+            placements = list(FINAL_LAZOR_PROJECT_extended.iter_placements(
+                positions, *counts, restricted=restricted))
+            prefixes = FINAL_LAZOR_PROJECT_extended.placement_prefixes(
+                positions, *counts, restricted=restricted, parts=8)
+            parts = [list(FINAL_LAZOR_PROJECT_extended.iter_placements(
+                positions, *counts, restricted=restricted, prefix=prefix))
+                for prefix in prefixes]
+            self.assertEqual(sorted(p for part in parts for p in part),
+                             sorted(placements))
+            self.assertGreaterEqual(len(prefixes), min(8, len(placements)))
+
+        # 4 identical blocks over 16 positions: the largest part is 13
+        # of the 1820 placements (455 when split by the first block)
+        positions = [[x, y] for y in range(4) for x in range(4)]
+        parts = [len(list(FINAL_LAZOR_PROJECT_extended.iter_placements(
+            positions, 0, 4, 0, prefix=prefix)))
+            for prefix in FINAL_LAZOR_PROJECT_extended.placement_prefixes(
+                positions, 0, 4, 0, parts=512)]
+        self.assertEqual((sum(parts), max(parts)), (1820, 13))
+
+    def test_solve_parallel(self):
+        solved, board = FINAL_LAZOR_PROJECT_extended.solve_game(
+            self.tiny_5, mode="parallel", processes=2)
+        self.assertTrue(solved)
+        self.assertEqual(sum(row.count(REFLECT) for row in board), 3)
+
+        # no blocks to put, the board is already solved
+        stats = FINAL_LAZOR_PROJECT_extended.SolveStats()
+        solved, board = FINAL_LAZOR_PROJECT_extended.solve_parallel(
+            FINAL_LAZOR_PROJECT_extended.Puzzle(
+                ("xx", "xx"), 0, 0, 0, ((1, 0, 1, 1),), ((2, 1),)),
+            processes=2, stats=stats)
+        self.assertTrue(solved)
+        self.assertEqual(stats.iterations, 1)
+
+    def test_solve_batch(self):
+        missing = os.path.join(self.folder, "missing.bff")
+        results = list(FINAL_LAZOR_PROJECT_extended.solve_batch(
+            [self.folder, missing], processes=2))
+        status = dict((r.filename, r.status) for r in results)
+        self.assertEqual(status, {self.dark_1: "solved",
+                                  self.tiny_5: "solved",
+                                  missing: "error"})
+
+        # boards of the same size get images named after their levels
+        list(FINAL_LAZOR_PROJECT_extended.solve_batch(
+            [self.dark_1, self.tiny_5], processes=2, render=True))
+        for level in ["dark_1", "tiny_5"]:
+            self.assertTrue(os.path.exists(os.path.join(
+                self.folder, "lazor_solution_%s_3_3_100.png" % level)))
+
+    def test_solve_stats(self):
+        steps = {}
+        for mode in ["random", "exhaustive", "backtrack", "parallel",
+                     "anytime"]:
+            stats = FINAL_LAZOR_PROJECT_extended.SolveStats()
+            solved, board = FINAL_LAZOR_PROJECT_extended.solve_game(
+                self.tiny_5, mode, processes=1, stats=stats)
+            self.assertEqual(stats.mode, mode)
+            self.assertTrue(stats.solved)
+            self.assertGreater(stats.iterations, 0)
+            self.assertGreater(stats.steps, 0)
+            steps[mode] = stats.steps
+        # the same placements are checked in the same order
+        self.assertEqual(steps["exhaustive"], steps["anytime"])
+
+    def test_solve_profile(self):
+        stats = FINAL_LAZOR_PROJECT_extended.SolveStats(profile=True)
+        FINAL_LAZOR_PROJECT_extended.solve_game(self.dark_1, stats=stats)
+        for stage in ["create_board", "put_blocks", "create_grid", "shoot",
+                      "hit_all_targets"]:
+            self.assertGreater(stats.counters[stage], 0)
+            self.assertGreaterEqual(stats.timers[stage], 0)
+        self.assertEqual(stats.counters["shoot"], stats.iterations)
+        self.assertGreater(stats.counters["steps"], 0)
+        output = io.StringIO()
+        stats.dump(output)
+        self.assertIn("create_grid", output.getvalue())
+
+        # the backtrack and parallel modes time their stages too, the
+        # parallel one over all its workers
+        for mode in ["backtrack", "parallel"]:
+            stats = FINAL_LAZOR_PROJECT_extended.SolveStats(profile=True)
+            FINAL_LAZOR_PROJECT_extended.solve_game(
+                self.tiny_5, mode, processes=2, stats=stats)
+            for stage in ["put_blocks", "hit_all_targets"]:
+                self.assertGreater(stats.counters[stage], 0)
+            self.assertEqual(stats.counters["hit_all_targets"],
+                             stats.iterations)
+
+        # nothing is timed unless profiling
+        stats = FINAL_LAZOR_PROJECT_extended.SolveStats()
+        FINAL_LAZOR_PROJECT_extended.solve_game(self.dark_1, stats=stats)
+        self.assertEqual(len(stats.timers), 0)
+        self.assertEqual(len(stats.counters), 0)
+
+    def test_solution_cache(self):
+        cache = FINAL_LAZOR_PROJECT_extended.SolutionCache(
+            ":memory:", max_entries=1)
+        solved, board = FINAL_LAZOR_PROJECT_extended.solve_game(
+            self.tiny_5, "backtrack", cache=cache)
+        stats = FINAL_LAZOR_PROJECT_extended.SolveStats()
+        self.assertEqual(FINAL_LAZOR_PROJECT_extended.solve_game(
+            self.tiny_5, "backtrack", stats=stats, cache=cache),
+            (solved, board))
+        self.assertTrue(stats.cached)
+
+        # the order of the lasers and targets does not change the key
+        args = FINAL_LAZOR_PROJECT_extended.read_file(self.dark_1)
+        key = FINAL_LAZOR_PROJECT_extended.puzzle_key(*args)
+        board_str, num_blocks, lasers_pos, lasers_dir, targets = args
+        self.assertEqual(
+            FINAL_LAZOR_PROJECT_extended.puzzle_key(
+                board_str, num_blocks, lasers_pos[::-1], lasers_dir[::-1],
+                targets[::-1]),
+            key)
+
+        # the least recently used solution is removed
+        FINAL_LAZOR_PROJECT_extended.solve_game(
+            self.dark_1, "backtrack", cache=cache)
+        self.assertEqual(len(cache), 1)
+        self.assertIsNotNone(cache.get(key))
+        cache.close()
+
+    def test_solve_backtrack(self):
+        for filename in [self.dark_1, self.tiny_5]:
+            solved, board = FINAL_LAZOR_PROJECT_extended.solve_game(
+                filename, mode="backtrack")
+            self.assertTrue(solved)
+
+        # the board found is an actual solution
+        game = FINAL_LAZOR_PROJECT_extended.Game(
+            *FINAL_LAZOR_PROJECT_extended.read_file(self.tiny_5))
+        game.board = board
+        game.create_grid()
+        game.shoot_all()
+        self.assertTrue(game.hit_all_targets())
+        self.assertEqual(sum(row.count(REFLECT) for row in board), 3)
+        self.assertEqual(sum(row.count(REFRACT) for row in board), 1)
+
+    def test_shoot_reflects_twice(self):
+        # the laser is reflected down by the top left block and then
+        # to the left by the bottom right block
+        game = self.new_game()
+        game.board = [[REFLECT, 0, 0], [0, 0, 0], [0, 0, REFLECT]]
+        game.create_grid()
+        laser = FINAL_LAZOR_PROJECT_extended.Laser(1, 2, 1, -1)
+        game.available_lasers = [laser]
+        game.shoot_all()
+        self.assertEqual(laser.get_trajectory()[:5],
+                         [[1, 2], [2, 3], [3, 4], [4, 5], [3, 6]])
+
+    def test_beam_trace_set_block(self):
+        # updating the beams one block at a time gives the same points
+        # as shooting all the lasers of the final board from scratch
+        game = self.new_game()
+        trace = FINAL_LAZOR_PROJECT_extended.BeamTrace(game)
+        changes = [(1, 0, REFLECT), (1, 1, REFRACT), (2, 1, OPAQUE),
+                   (1, 0, VALID), (0, 2, REFLECT), (1, 1, REFLECT)]
+        for x, y, block_type in changes:
+            trace.set_block(x, y, block_type)
+
+        fresh = self.new_game()
+        fresh.board = [row[:] for row in game.board]
+        fresh.create_grid()
+        fresh.shoot_all()
+        expected = set(
+            tuple(p) for laser in fresh.available_lasers
+            for p in laser.get_trajectory()
+            if fresh.within_bounds(fresh.grid, p[0], p[1]))
+        traced = set(
+            tuple(p) for path in trace.trajectories() for p in path)
+        self.assertEqual(traced, expected)
+        self.assertEqual(trace.hit_all_targets(), fresh.hit_all_targets())
+
+    def test_save_board(self):
+        from PIL import Image
+        board = [[VALID, REFLECT, OPAQUE], [REFRACT, INVALID, VALID]]
+        FINAL_LAZOR_PROJECT_extended.save_board(board, 3, "test")
+        img = Image.open("test_3_2_3.png")
+        self.assertEqual(img.size, (9, 6))
+        for y, row in enumerate(board):
+            for x, block in enumerate(row):
+                color = FINAL_LAZOR_PROJECT_extended.COLORS[block]
+                self.assertEqual(img.getpixel((3*x, 3*y)), color)
+                self.assertEqual(img.getpixel((3*x + 2, 3*y + 2)), color)
+
+    def test_lazy_image_backend(self):
+        # the solver alone does not import PIL or numpy, nor does solving
+        # a board without rendering it
+        code = ("import sys, FINAL_LAZOR_PROJECT_extended; "
+                "FINAL_LAZOR_PROJECT_extended.solve_game(sys.argv[1], "
+                "'backtrack', render=False); "
+                "print('PIL' in sys.modules or 'numpy' in sys.modules)")
+        output = subprocess.run(
+            [sys.executable, "-c", code, self.dark_1], capture_output=True,
+            text=True,
+            cwd=os.path.dirname(os.path.abspath(
+                FINAL_LAZOR_PROJECT_extended.__file__))).stdout
+        self.assertEqual(output.strip(), "False")
+
+    def test_steps(self):
+        # every engine counts one step per point and direction a beam goes
+        # through, including the last point before it leaves the grid:
+        # straight across the board, split by a refractive block and
+        # reflected into an opaque one
+        for board, laser, steps in [(["ooo", "ooo", "ooo"], [0, 1], 6),
+                                    (["ooo", "oCo", "ooo"], [2, 1], 7),
+                                    (["ooo", "oAB", "ooo"], [2, 1], 4)]:
+            args = (board, [0, 0, 0], [laser], [[1, 1]], [[3, 6]])
+            game = FINAL_LAZOR_PROJECT_extended.Game(*args)
+            game.create_board()
+            game.create_grid()
+            table = FINAL_LAZOR_PROJECT_extended.TransitionTable(game)
+            table.shoot()
+            trace = FINAL_LAZOR_PROJECT_extended.BeamTrace(game)
+            game.shoot_all()
+            self.assertEqual(game.steps, steps)
+            self.assertEqual(table.steps, steps)
+            self.assertEqual(trace.steps, steps)
+
+    def test_laser_path(self):
+        # the path is an array of packed points, negative coordinates
+        # included, and the trajectory is given as [x, y] lists
+        laser = FINAL_LAZOR_PROJECT_extended.Laser(3, 0, -1, 1)
+        self.assertFalse(hasattr(laser, "__dict__"))
+        laser.add_to_path([-1, 2])
+        laser.absorb(-1, 1, 2)
+        self.assertEqual(laser.get_trajectory(), [[3, 0], [-1, 2], [-2, -2]])
+        self.assertEqual(laser.path.typecode, "i")
+        self.assertFalse(laser.was_shot)
+
+    def test_beam_states(self):
+        # the first beam starts with the packed position and direction
+        # of its laser, and beams keep no per-instance dictionary
+        game = self.new_game()
+        trace = FINAL_LAZOR_PROJECT_extended.BeamTrace(game)
+        beam = trace.beams[0]
+        self.assertFalse(hasattr(beam, "__dict__"))
+        self.assertEqual(trace.unpack(beam.states[0]),
+                         tuple(game.lasers_pos[0] + game.lasers_dir[0]))
+
+    def test_create_grid_in_place(self):
+        game = self.new_game()
+        cells = game.cells
+        game.reset()
+        game.board[0][1] = REFLECT
+        game.board[1][1] = REFRACT
+        game.board[1][2] = OPAQUE
+        game.create_grid()
+        # the grid buffer is reused
+        self.assertIs(game.cells, cells)
+
+        # and the grids are the ones built block by block with cardinal()
+        grid = [[VALID] * game.g_width for _ in range(game.g_height)]
+        grid_faces = [[VALID] * game.g_width for _ in range(game.g_height)]
+        for h, row in enumerate(game.board):
+            for w, value in enumerate(row):
+                game.cardinal(grid, grid_faces, 2*w+1, 2*h+1, value)
+        self.assertEqual([list(row) for row in game.grid], grid)
+        self.assertEqual([list(row) for row in game.grid_faces], grid_faces)
+
+    def test_face_map(self):
+        game = self.new_game()
+        faces = FINAL_LAZOR_PROJECT_extended.face_map(7, 7)
+        self.assertEqual(bytes(game.cells[game.layer_size:]), faces)
+        # horizontal faces above and below a block, vertical ones at its sides
+        self.assertEqual((faces[0*7 + 1], faces[1*7 + 0], faces[1*7 + 1]),
+                         (1, 2, 0))
+        # computed once per grid size
+        self.assertIs(FINAL_LAZOR_PROJECT_extended.face_map(7, 7), faces)
+
+    def test_layout_key(self):
+        board = [[1, 0, 0], [0, 0, 0], [0, 0, 1]]
+        key = FINAL_LAZOR_PROJECT_extended.layout_key(board)
+        board2 = [[1, 0, 0], [0, REFLECT, 0], [0, 0, 1]]
+        key2 = FINAL_LAZOR_PROJECT_extended.layout_key(board2)
+        self.assertNotEqual(key, key2)
+        # putting a block in an empty position adds its value to the key
+        shift = FINAL_LAZOR_PROJECT_extended.LAYOUT_BITS * 4
+        self.assertEqual(key + (REFLECT << shift), key2)
+
+    def test_visited_layouts(self):
+        visited = FINAL_LAZOR_PROJECT_extended.VisitedLayouts(max_size=2)
+        self.assertTrue(visited.add(1))
+        self.assertFalse(visited.add(1))
+        self.assertTrue(visited.add(2))
+        self.assertTrue(visited.add(3))
+        # the oldest key was forgotten
+        self.assertEqual(len(visited), 2)
+        self.assertNotIn(1, visited)
+        self.assertEqual(visited.evicted, 1)
+
+    def test_shoot_trace(self):
+        game = self.new_game()
+        FINAL_LAZOR_PROJECT_extended.set_log_level(logging.DEBUG, "shoot")
+        try:
+            # only the laser with tracing turned on is logged
+            game.available_lasers[1].trace = True
+            with self.assertLogs("lazor.shoot", logging.DEBUG) as logs:
+                game.shoot_all()
+            self.assertTrue(all("laser 1, 6" in line for line in logs.output))
+        finally:
+            FINAL_LAZOR_PROJECT_extended.set_log_level(logging.NOTSET)
+
+    def test_transition_table(self):
+        game = self.new_game()
+        table = FINAL_LAZOR_PROJECT_extended.TransitionTable(game)
+        for x, y, block_type in [(1, 0, REFRACT), (2, 1, REFLECT),
+                                 (1, 1, OPAQUE), (1, 0, VALID)]:
+            table.set_block(x, y, block_type)
+
+        # updating the table gives the same table as compiling the board
+        fresh = self.new_game()
+        fresh.board = [row[:] for row in game.board]
+        fresh.create_grid()
+        compiled = FINAL_LAZOR_PROJECT_extended.TransitionTable(fresh)
+        self.assertEqual(table.table, compiled.table)
+
+        # and the same points as tracing the beams
+        lit = table.shoot()
+        traced = FINAL_LAZOR_PROJECT_extended.BeamTrace(fresh)
+        expected = set(
+            tuple(p) for path in traced.trajectories() for p in path)
+        self.assertEqual(
+            set((i % game.g_width, i // game.g_width)
+                for i in range(len(lit)) if lit[i]),
+            expected)
+        self.assertEqual(table.hit_all_targets(), traced.hit_all_targets())
+
+    def test_shoot_stops_at_visited_states(self):
+        # with refractive blocks everywhere the beams are split over and
+        # over, and end up going through the same states again
+        game = self.new_game()
+        game.board = [[1, REFRACT, REFRACT], [REFRACT, REFRACT, REFRACT],
+                      [REFRACT, REFRACT, 1]]
+        game.create_grid()
+        # a second laser identical to the first one is not traced again
+        game.available_lasers.append(FINAL_LAZOR_PROJECT_extended.Laser(
+            3, 0, -1, 1))
+        game.shoot_all()
+        self.assertEqual(game.available_lasers[4].get_trajectory(),
+                         [[3, 0], [-1, -1]])
+
+        # no two refracted lasers start in the same state
+        paths = [laser.get_trajectory()
+                 for laser in game.available_lasers[5:]]
+        starts = [(path[1][0], path[1][1], path[1][0] - path[0][0],
+                   path[1][1] - path[0][1]) for path in paths]
+        self.assertEqual(len(starts), len(set(starts)))
+
+        trace = FINAL_LAZOR_PROJECT_extended.BeamTrace(game)
+        self.assertEqual(
+            set(tuple(p) for path in trace.trajectories() for p in path),
+            set(tuple(p) for laser in game.available_lasers
+                for p in laser.get_trajectory()
+                if game.within_bounds(game.grid, p[0], p[1])))
+
+    def test_hit_all_targets_mask(self):
+        game = self.new_game()
+        game.board = [[1, REFLECT, 0], [0, OPAQUE, REFRACT], [0, 0, 1]]
+        game.create_grid()
+        game.shoot_all()
+        points = [p for laser in game.available_lasers
+                  for p in laser.get_trajectory()]
+        self.assertEqual(game.hit_all_targets(),
+                         all(t in points for t in game.targets))
+
+        # with the early exit the lasers are not shot further than needed
+        solved = self.new_game()
+        solved.board = [[1, 0, 0], [0, OPAQUE, 0], [OPAQUE, OPAQUE, 1]]
+        solved.create_grid()
+        solved.stop_when_solved = True
+        solved.shoot_all()
+        self.assertTrue(solved.hit_all_targets())
+        self.assertTrue(
+            FINAL_LAZOR_PROJECT_extended.TransitionTable(solved).hit_all_targets())
+
+if __name__ == "__main__":
+    unittest.main()
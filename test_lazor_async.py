@@ -0,0 +1,88 @@
+import asyncio
+import time
+import unittest
+import lazor_async
+from test_FINAL_LAZOR_PROJECT_extended import DARK_1, TINY_5
+
+# unsolvable board that the random mode takes seconds to give up on
+NUMBERED_6 = """GRID START
+o o o
+o x x
+o o o
+x o o
+o o o
+GRID STOP
+
+A 3
+B 3
+
+L 4 9 -1 -1
+L 6 9 -1 -1
+
+P 2 5
+P 5 0
+"""
+
+
+class AsyncSolverTest(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.solver = lazor_async.AsyncSolver(processes=1)
+
+    async def asyncTearDown(self):
+        self.solver.close()
+
+    async def test_solve(self):
+        result = await self.solver.solve(DARK_1, "exhaustive")
+        self.assertTrue(result["solved"])
+        self.assertEqual(result["board"], [[1, 0, 0], [0, 3, 0], [3, 3, 1]])
+        self.assertEqual(self.solver.pending(), 0)
+        with self.assertRaises(ValueError):
+            await self.solver.solve(DARK_1, "parallel")
+
+    async def test_coalesce(self):
+        # the same puzzle submitted twice at once is solved once
+        first = asyncio.create_task(self.solver.solve(DARK_1))
+        second = asyncio.create_task(self.solver.solve(DARK_1))
+        other = asyncio.create_task(self.solver.solve(TINY_5))
+        await asyncio.sleep(0)
+        self.assertEqual(self.solver.pending(), 2)
+        first, second, other = await asyncio.gather(first, second, other)
+        self.assertEqual(first, second)
+        self.assertTrue(other["solved"])
+        self.assertEqual(self.solver.pending(), 0)
+
+    async def test_timeout_and_cancel(self):
+        with self.assertRaises(asyncio.TimeoutError):
+            await self.solver.solve(DARK_1, timeout=0)
+        self.assertEqual(self.solver.pending(), 0)
+
+        # a caller that is cancelled does not stop the search of the others
+        first = asyncio.create_task(self.solver.solve(TINY_5))
+        second = asyncio.create_task(self.solver.solve(TINY_5))
+        await asyncio.sleep(0)
+        first.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await first
+        self.assertTrue((await second)["solved"])
+
+    async def test_stop_running_search(self):
+        # the abandoned search gives up, so the only worker is free for the next one
+        running = asyncio.create_task(self.solver.solve(NUMBERED_6, "random"))
+        await asyncio.sleep(0.5)
+        running.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await running
+        start = time.perf_counter()
+        self.assertTrue((await self.solver.solve(DARK_1, "exhaustive", timeout=3))["solved"])
+        self.assertLess(time.perf_counter() - start, 3)
+
+    async def test_context_manager(self):
+        async with lazor_async.AsyncSolver(processes=1) as solver:
+            self.assertTrue((await solver.solve(DARK_1))["solved"])
+            with self.assertRaises(asyncio.TimeoutError):
+                await solver.solve(NUMBERED_6, "random", timeout=0.2)
+        self.assertEqual(solver.pending(), 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,46 @@
+import os
+import shutil
+import tempfile
+import unittest
+import lazor_benchmark
+from test_FINAL_LAZOR_PROJECT_extended import DARK_1
+
+
+class BenchmarkTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        with open(os.path.join(self.folder, "dark_1.bff"), 'w') as f:
+            f.write(DARK_1)
+        self.cwd = os.getcwd()
+        # solution images are saved in the working directory
+        os.chdir(self.folder)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.folder)
+
+    def test_run_benchmark(self):
+        results = lazor_benchmark.run_benchmark(
+            self.folder, ["dark_1", "missing_1"], ["random", "backtrack"],
+            [0, 1])
+        self.assertEqual([(r["level"], r.get("mode"), r.get("seed"))
+                          for r in results],
+                         [("dark_1", "random", 0), ("dark_1", "random", 1),
+                          ("dark_1", "backtrack", 0), ("missing_1", None, None)])
+        self.assertEqual(results[-1]["status"], "missing")
+        for r in results[:-1]:
+            self.assertEqual(r["status"], "solved")
+            self.assertGreater(r["peak_memory"], 0)
+            self.assertGreater(r["iterations"], 0)
+
+        # the random mode is repeatable with the same seed
+        again = lazor_benchmark.run_benchmark(
+            self.folder, ["dark_1"], ["random"], [0], memory=False)
+        self.assertEqual(again[0]["iterations"], results[0]["iterations"])
+        # only the search is timed, no solution image is saved
+        self.assertEqual(
+            [f for f in os.listdir(self.folder) if f.endswith(".png")], [])
+
+if __name__ == "__main__":
+    unittest.main()
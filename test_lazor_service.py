@@ -0,0 +1,71 @@
+import json
+import threading
+import time
+import unittest
+import urllib.error
+import urllib.request
+import lazor_service
+from test_FINAL_LAZOR_PROJECT_extended import DARK_1
+
+
+class ServiceTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.service = lazor_service.SolverService(processes=1)
+        cls.server = lazor_service.make_server(cls.service, port=0)
+        cls.url = "http://127.0.0.1:%i" % cls.server.server_address[1]
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        cls.service.close()
+
+    def request(self, path, data=None):
+        try:
+            with urllib.request.urlopen(self.url + path, data) as response:
+                return response.status, json.load(response)
+        except urllib.error.HTTPError as error:
+            return error.code, json.load(error)
+
+    def test_solve(self):
+        code, result = self.request("/solve?mode=exhaustive",
+                                    DARK_1.encode())
+        self.assertEqual(code, 200)
+        self.assertTrue(result["solved"])
+        self.assertEqual(result["board"], [[1, 0, 0], [0, 3, 0], [3, 3, 1]])
+        self.assertEqual(result["stats"]["mode"], "exhaustive")
+
+    def test_solve_anytime(self):
+        code, result = self.request("/solve?mode=anytime&budget=0.5",
+                                    DARK_1.encode())
+        self.assertEqual(code, 200)
+        self.assertTrue(result["solved"])
+        self.assertEqual(result["stats"]["targets_hit"], 2)
+        self.assertEqual(
+            self.request("/solve?mode=anytime&budget=soon",
+                         DARK_1.encode())[0], 400)
+
+    def test_jobs(self):
+        code, job = self.request("/jobs", DARK_1.encode())
+        self.assertEqual(code, 202)
+        for _ in range(100):
+            code, result = self.request("/jobs/%i" % job["id"])
+            if result["state"] != "pending":
+                break
+            time.sleep(0.05)
+        self.assertEqual(code, 200)
+        self.assertEqual(result["state"], "done")
+        self.assertTrue(result["solved"])
+        self.assertEqual(self.request("/jobs/12345")[0], 404)
+
+    def test_bad_requests(self):
+        self.assertEqual(self.request("/solve", b"GRID START\no o\n")[0], 400)
+        self.assertEqual(
+            self.request("/solve?mode=parallel", DARK_1.encode())[0], 400)
+        self.assertEqual(self.request("/unknown", b"")[0], 404)
+
+if __name__ == "__main__":
+    unittest.main()